@@ -74,7 +74,7 @@ MAX_AUDIO_LENGTH = 600  # seconds (10 minutes) for performance
 
 # Export settings
 EXPORT_SAMPLE_RATE = 44100
-EXPORT_BIT_DEPTH = 32  # float
+EXPORT_BIT_DEPTH = 24  # 24 = PCM_24, 16 = dithered PCM_16 (smallest), 32 = float (bit-exact)
 EXPORT_FORMAT = "wav"
 
 # Performance settings
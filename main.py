@@ -9,6 +9,7 @@ import torch
 # Add src to path
 sys.path.append(os.getcwd())
 
+from config import PROJECTS_DIR, SAMPLE_RATE, HOP_LENGTH, N_FFT
 from src.io_utils import (
     ProjectManager, load_audio_file, create_project_from_audio,
     save_analysis_results, get_stem_path, get_midi_path, save_audio_file,
@@ -18,7 +19,7 @@ from src.app_helpers import merge_beat_summary
 # Import separation - validation is handled inside
 from src.separation import StemSeparator, DEMUCS_AVAILABLE
 
-from src.timing import create_beat_grid
+from src.timing import ANALYSIS_VERSION, create_beat_grid
 from src.drums import extract_drums_to_midi
 from src.chords import analyze_chord_progression, detect_key_from_chroma
 from src.strudel_integration import generate_strudel_from_analysis
@@ -43,6 +44,15 @@ def main():
     # 1. Create Project
     print("\n📁 Creating Project...")
     try:
+        # Remember the previous run's checksum before the config is rewritten; read
+        # the file directly so a failed run leaves no project directory behind
+        try:
+            with open(PROJECTS_DIR / PROJECT_NAME / "project.ltw.json", "r") as f:
+                previous_config = json.load(f)
+        except (OSError, ValueError):
+            previous_config = {}
+        if not isinstance(previous_config, dict):
+            previous_config = {}
         project = create_project_from_audio(INPUT_FILE, PROJECT_NAME)
         print(f"✅ Project created at: {project.project_path}")
     except Exception as e:
@@ -56,8 +66,28 @@ def main():
 
     # 2. Analyze Tempo & Beats
     print("\n🎼 Analyzing Tempo & Beats...")
-    beat_analysis = create_beat_grid(audio_data, audio_sr)
+    beat_analysis = None
+    # The beat grid depends only on the source audio, the timing code and the STFT
+    # settings, so reuse it while all of them are unchanged
+    beat_grid_settings = {
+        "checksum": config["audio"]["checksum"],
+        "analysis_version": ANALYSIS_VERSION,
+        "sr": SAMPLE_RATE,
+        "hop_length": HOP_LENGTH,
+        "n_fft": N_FFT,
+    }
+    previous_audio = previous_config.get("audio") or {}
+    if all(previous_audio.get(k) == v for k, v in beat_grid_settings.items()):
+        try:
+            beat_analysis = load_analysis_results(project, "tempo_beats")
+        except (OSError, ValueError):
+            beat_analysis = None  # unreadable or corrupt; recompute below
+    if isinstance(beat_analysis, dict) and "tempo" in beat_analysis:
+        print("    Source audio unchanged, reusing saved tempo_beats.json")
+    else:
+        beat_analysis = create_beat_grid(audio_data, audio_sr)
     save_analysis_results(project, "tempo_beats", beat_analysis)
+    config["audio"].update(beat_grid_settings)
     merge_beat_summary(config, beat_analysis)
     project.save_project_config(config)
     print(f"✅ Tempo: {beat_analysis['tempo']:.1f} BPM")
@@ -201,19 +231,19 @@ def main():
             },
         )
         
-        strudel_files = generate_strudel_from_analysis(
+        _, strudel_code = generate_strudel_from_analysis(
             analysis_data, 
-            str(project.project_path / "strudel")
+            str(project.project_path / "strudel"),
+            with_contents=True,
         )
         
         print("✅ Strudel generation complete!")
         print(f"Files saved to: {project.project_path / 'strudel'}")
         
-        # Read and print the complete pattern
-        if 'arrangement' in strudel_files:
+        # Print the complete pattern
+        if 'arrangement' in strudel_code:
             print("\n--- Generated Strudel Arrangement ---\n")
-            with open(strudel_files['arrangement'], 'r') as f:
-                print(f.read())
+            print(strudel_code['arrangement'])
             print("\n------------------------------")
             
     except Exception as e:
@@ -18,7 +18,7 @@ if not exist "venv" (
 
 call venv\Scripts\activate.bat
 
-python -c "import streamlit, librosa, demucs" 2>nul
+python -c "import importlib.util, sys; sys.exit(any(importlib.util.find_spec(m) is None for m in ('streamlit', 'librosa', 'demucs')))" 2>nul
 if errorlevel 1 pip install -r requirements.txt
 
 echo Starting LTW Audio v2 at http://localhost:8501
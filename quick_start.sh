@@ -19,7 +19,7 @@ echo "🔧 Activating virtual environment..."
 source venv/bin/activate
 
 echo "📦 Checking dependencies..."
-python -c "import streamlit, librosa, demucs, torch" 2>/dev/null
+python -c "import importlib.util, sys; sys.exit(any(importlib.util.find_spec(m) is None for m in ('streamlit', 'librosa', 'demucs', 'torch')))" 2>/dev/null
 if [ $? -ne 0 ]; then
     echo "Installing requirements..."
     pip install -r requirements.txt
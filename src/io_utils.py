@@ -18,6 +18,14 @@ from config import (
 )
 
 
+# soundfile subtype for each EXPORT_BIT_DEPTH setting
+_EXPORT_SUBTYPES = {16: "PCM_16", 24: "PCM_24", 32: "FLOAT"}
+
+_DITHER_RNG = np.random.default_rng()
+
+# Frames handed to libsndfile per write call in save_audio_file()
+_WRITE_BLOCK_FRAMES = 1 << 20
+
 # Keys allowed inline in project.ltw.json (heavy data lives in analysis/*.json)
 _ANALYSIS_SCALAR_KEYS = frozenset({
     "tempo", "duration", "total_beats", "key_guess", "key_confidence",
@@ -137,13 +145,19 @@ def load_audio_file(file_path: Path, target_sr: int = SAMPLE_RATE) -> Tuple[np.n
     if not file_path.exists():
         raise FileNotFoundError(f"Audio file not found: {file_path}")
     
-    # Load audio with librosa (handles resampling automatically)
-    audio, sr = librosa.load(str(file_path), sr=target_sr, mono=True)
+    # Load audio with librosa (handles resampling automatically); float32 is what
+    # every analysis expects, so nothing downstream has to convert a float64 copy
+    audio, sr = librosa.load(str(file_path), sr=target_sr, mono=True, dtype=np.float32)
     
     return audio, sr
 
 
-def save_audio_file(audio: np.ndarray, file_path: Path, sr: int = EXPORT_SAMPLE_RATE):
+def save_audio_file(
+    audio: np.ndarray,
+    file_path: Path,
+    sr: int = EXPORT_SAMPLE_RATE,
+    bit_depth: int = EXPORT_BIT_DEPTH,
+):
     """
     Save audio data to file
     
@@ -151,12 +165,35 @@ def save_audio_file(audio: np.ndarray, file_path: Path, sr: int = EXPORT_SAMPLE_
         audio: Audio data as numpy array
         file_path: Output file path
         sr: Sample rate
+        bit_depth: 16 or 24 (PCM), or 32 (float); 16-bit output is TPDF-dithered
     """
+    if bit_depth not in _EXPORT_SUBTYPES:
+        raise ValueError(f"Unsupported export bit depth: {bit_depth}")
+
     # Ensure directory exists
     file_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if bit_depth == 16:
+        audio = _tpdf_dither_16bit(audio)
+
+    channels = 1 if audio.ndim == 1 else audio.shape[1]
     
-    # Save with soundfile
-    sf.write(str(file_path), audio, sr, subtype='FLOAT')
+    # Stream to soundfile in blocks of views (float -> int conversion happens on write),
+    # so libsndfile never needs a full-length converted copy of the stem
+    with sf.SoundFile(
+        str(file_path), "w", samplerate=sr, channels=channels,
+        subtype=_EXPORT_SUBTYPES[bit_depth],
+    ) as snd:
+        for i in range(0, len(audio), _WRITE_BLOCK_FRAMES):
+            snd.write(audio[i:i + _WRITE_BLOCK_FRAMES])
+
+
+def _tpdf_dither_16bit(audio: np.ndarray) -> np.ndarray:
+    """Add ±1 LSB triangular dither before 16-bit quantization."""
+    audio = np.asarray(audio, dtype=np.float32)
+    noise = _DITHER_RNG.triangular(-1.0, 0.0, 1.0, size=audio.shape).astype(np.float32)
+    dithered = audio + noise * np.float32(1.0 / 32768.0)
+    return np.clip(dithered, -1.0, 1.0, out=dithered)
 
 
 def is_supported_format(file_path: Path) -> bool:
@@ -180,18 +217,30 @@ def list_projects() -> list:
     if not PROJECTS_DIR.exists():
         return []
 
-    projects = []
-    for project_dir in sorted(PROJECTS_DIR.iterdir(), key=lambda p: p.name.lower()):
-        if not project_dir.is_dir():
-            continue
-        project_file = project_dir / "project.ltw.json"
-        if not project_file.exists():
-            continue
+    # One scandir pass: dirent types are cached, so no extra stat per entry
+    with os.scandir(PROJECTS_DIR) as it:
+        project_dirs = sorted(
+            (Path(entry.path) for entry in it if entry.is_dir()),
+            key=lambda p: p.name.lower(),
+        )
 
-        summary = _read_project_list_summary(project_dir.name, project_file)
-        projects.append({"name": project_dir.name, "config": summary})
+    if not project_dirs:
+        return []
 
-    return projects
+    # Configs are small and json.load holds the GIL, so read them serially
+    return [
+        {"name": project_dir.name, "config": summary}
+        for project_dir in project_dirs
+        if (summary := _read_project_dir_summary(project_dir)) is not None
+    ]
+
+
+def _read_project_dir_summary(project_dir: Path) -> Optional[Dict[str, Any]]:
+    """Summary for one project directory, or None if it has no project file."""
+    project_file = project_dir / "project.ltw.json"
+    if not project_file.exists():
+        return None
+    return _read_project_list_summary(project_dir.name, project_file)
 
 
 def _read_project_list_summary(name: str, project_file: Path) -> Dict[str, Any]:
@@ -245,17 +294,18 @@ def create_project_from_audio(audio_path: Path, project_name: str) -> ProjectMan
     # Create project manager
     project = ProjectManager(project_name)
     
-    # Load audio to get metadata
-    audio, sr = load_audio_file(audio_path)
-    duration = len(audio) / sr
+    # Metadata comes from the file header; callers decode the audio themselves,
+    # so a full load here would only be thrown away
+    checksum = calculate_audio_checksum(audio_path)
+    duration = get_audio_duration(audio_path)
     
     # Create initial project config
     config = {
         "audio": {
             "path": str(audio_path.absolute()),
-            "sr": sr,
+            "sr": SAMPLE_RATE,
             "duration": duration,
-            "checksum": calculate_audio_checksum(audio_path)
+            "checksum": checksum
         },
         "stems": {},
         "analysis": {},
@@ -5,7 +5,7 @@ Handles F0 detection and MIDI conversion
 import numpy as np
 import librosa
 import pretty_midi
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple, Union
 from scipy.signal import medfilt
 
 try:
@@ -20,6 +20,69 @@ from config import (
 )
 
 
+# Notes are stored column-wise in one structured array rather than a dict per note
+NOTE_DTYPE = np.dtype([
+    ("pitch", "i2"),
+    ("start", "f4"),
+    ("end", "f4"),
+    ("dur", "f4"),
+    ("conf", "f4"),
+    ("vel", "i2"),
+])
+
+NoteInput = Union[np.ndarray, List[Dict[str, Any]]]
+
+
+def _as_note_array(notes: NoteInput) -> np.ndarray:
+    """Accept a NOTE_DTYPE array or legacy list of note dicts; return an array."""
+    if isinstance(notes, np.ndarray) and notes.dtype == NOTE_DTYPE:
+        return notes
+
+    arr = np.empty(len(notes), dtype=NOTE_DTYPE)
+    if len(arr) == 0:
+        return arr
+    arr["pitch"] = [n["pitch"] for n in notes]
+    arr["start"] = [n["start_time"] for n in notes]
+    arr["end"] = [n.get("end_time", n["start_time"]) for n in notes]
+    arr["dur"] = [n.get("duration", n.get("end_time", n["start_time"]) - n["start_time"]) for n in notes]
+    arr["conf"] = [n.get("confidence", 1.0) for n in notes]
+    arr["vel"] = [n.get("velocity", MIDI_VELOCITY_DEFAULT) for n in notes]
+    return arr
+
+
+def _to_dicts(notes: np.ndarray) -> List[Dict[str, Any]]:
+    """Convert a NOTE_DTYPE array to JSON-friendly note dicts (public API boundary)."""
+    return [
+        {
+            "pitch": pitch,
+            "start_time": start,
+            "end_time": end,
+            "duration": dur,
+            "confidence": conf,
+            "velocity": vel,
+        }
+        for pitch, start, end, dur, conf, vel in zip(
+            notes["pitch"].tolist(),
+            notes["start"].tolist(),
+            notes["end"].tolist(),
+            notes["dur"].tolist(),
+            notes["conf"].tolist(),
+            notes["vel"].tolist(),
+        )
+    ]
+
+
+def _nearest_index(sorted_values: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """Index of the nearest entry in sorted_values for each target (ties go left)."""
+    if len(sorted_values) == 1:
+        return np.zeros(len(targets), dtype=np.intp)
+    idx = np.clip(np.searchsorted(sorted_values, targets), 1, len(sorted_values) - 1)
+    left = sorted_values[idx - 1]
+    right = sorted_values[idx]
+    idx -= (targets - left) <= (right - targets)
+    return idx
+
+
 def extract_melody_f0(audio: np.ndarray, sr: int = SAMPLE_RATE) -> Dict[str, np.ndarray]:
     """
     Extract fundamental frequency (F0) from audio using CREPE
@@ -56,7 +119,7 @@ def f0_to_midi_notes(
     confidence_threshold: float = MELODY_CONF_THRESH,
     min_note_duration: float = MELODY_MIN_NOTE_DURATION,
     max_note_duration: float = MELODY_MAX_NOTE_DURATION
-) -> List[Dict[str, any]]:
+) -> np.ndarray:
     """
     Convert F0 data to MIDI notes
     
@@ -69,134 +132,90 @@ def f0_to_midi_notes(
         max_note_duration: Maximum note duration in seconds
         
     Returns:
-        List of note dictionaries
+        Structured array of notes (NOTE_DTYPE)
     """
-    notes = []
-    
-    # Filter by confidence
-    confident_mask = f0_confidence > confidence_threshold
-    confident_times = f0_times[confident_mask]
-    confident_freqs = f0_frequencies[confident_mask]
-    confident_conf = f0_confidence[confident_mask]
-    
-    if len(confident_times) == 0:
-        return notes
+    # Convert all frames to MIDI, then filter confidence + range in one pass
+    # (unvoiced 0 Hz frames map to -inf and fall out of the range check)
+    with np.errstate(divide="ignore"):
+        midi_notes = np.round(librosa.hz_to_midi(f0_frequencies))
+    valid_mask = (
+        (f0_confidence > confidence_threshold)
+        & (midi_notes >= 0)
+        & (midi_notes <= 127)
+    )
+    valid_times = f0_times[valid_mask]
+    valid_notes = midi_notes[valid_mask].astype(np.int16)
+    valid_conf = f0_confidence[valid_mask]
     
-    # Convert frequencies to MIDI note numbers
-    midi_notes = librosa.hz_to_midi(confident_freqs)
+    if len(valid_times) == 0:
+        return np.empty(0, dtype=NOTE_DTYPE)
     
-    # Round to nearest integer
-    midi_notes = np.round(midi_notes).astype(int)
+    # Segment consecutive frames with same pitch into notes
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(valid_notes)) + 1))
+    ends = np.concatenate((starts[1:] - 1, [len(valid_notes) - 1]))
     
-    # Filter out invalid MIDI notes
-    valid_mask = (midi_notes >= 0) & (midi_notes <= 127)
-    valid_times = confident_times[valid_mask]
-    valid_notes = midi_notes[valid_mask]
-    valid_conf = confident_conf[valid_mask]
+    note_start = valid_times[starts]
+    note_end = valid_times[ends]
+    note_duration = note_end - note_start
+    avg_confidence = np.add.reduceat(valid_conf, starts) / (ends - starts + 1)
     
-    if len(valid_times) == 0:
-        return notes
+    # Only include notes within duration limits
+    keep = (note_duration >= min_note_duration) & (note_duration <= max_note_duration)
     
-    # Segment consecutive frames with same pitch into notes
-    current_note = valid_notes[0]
-    note_start = valid_times[0]
-    note_confidence = [valid_conf[0]]
-    
-    for i in range(1, len(valid_times)):
-        if valid_notes[i] == current_note:
-            # Continue current note
-            note_confidence.append(valid_conf[i])
-        else:
-            # End current note and start new one
-            note_end = valid_times[i-1]
-            note_duration = note_end - note_start
-            
-            # Only include notes within duration limits
-            if min_note_duration <= note_duration <= max_note_duration:
-                avg_confidence = np.mean(note_confidence)
-                notes.append({
-                    "pitch": int(current_note),
-                    "start_time": float(note_start),
-                    "end_time": float(note_end),
-                    "duration": float(note_duration),
-                    "confidence": float(avg_confidence),
-                    "velocity": int(MIDI_VELOCITY_DEFAULT * avg_confidence)
-                })
-            
-            # Start new note
-            current_note = valid_notes[i]
-            note_start = valid_times[i]
-            note_confidence = [valid_conf[i]]
-    
-    # Handle last note
-    if len(valid_times) > 0:
-        note_end = valid_times[-1]
-        note_duration = note_end - note_start
-        
-        if min_note_duration <= note_duration <= max_note_duration:
-            avg_confidence = np.mean(note_confidence)
-            notes.append({
-                "pitch": int(current_note),
-                "start_time": float(note_start),
-                "end_time": float(note_end),
-                "duration": float(note_duration),
-                "confidence": float(avg_confidence),
-                "velocity": int(MIDI_VELOCITY_DEFAULT * avg_confidence)
-            })
+    notes = np.empty(int(keep.sum()), dtype=NOTE_DTYPE)
+    notes["pitch"] = valid_notes[starts[keep]]
+    notes["start"] = note_start[keep]
+    notes["end"] = note_end[keep]
+    notes["dur"] = note_duration[keep]
+    notes["conf"] = avg_confidence[keep]
+    notes["vel"] = (MIDI_VELOCITY_DEFAULT * avg_confidence[keep]).astype(np.int16)
     
     return notes
 
 
 def quantize_notes_to_beats(
-    notes: List[Dict[str, any]],
+    notes: NoteInput,
     beat_times: List[float],
     quantization_strength: float = 0.5
-) -> List[Dict[str, any]]:
+) -> np.ndarray:
     """
     Quantize note timing to beat grid
     
     Args:
-        notes: List of note dictionaries
+        notes: Note array (NOTE_DTYPE) or list of note dictionaries
         beat_times: List of beat times
         quantization_strength: How strongly to quantize (0-1)
         
     Returns:
         Quantized notes
     """
-    if not beat_times or not notes:
+    notes = _as_note_array(notes)
+    if len(beat_times) == 0 or len(notes) == 0:
         return notes
     
-    quantized_notes = []
+    beats = np.sort(np.asarray(beat_times, dtype=np.float64))
     
-    for note in notes:
-        # Find nearest beat for start and end times
-        start_beat_idx = np.argmin(np.abs(np.array(beat_times) - note["start_time"]))
-        end_beat_idx = np.argmin(np.abs(np.array(beat_times) - note["end_time"]))
-        
-        # Interpolate between original and quantized times
-        quantized_start = beat_times[start_beat_idx]
-        quantized_end = beat_times[end_beat_idx]
-        
-        # Apply quantization strength
-        new_start = note["start_time"] * (1 - quantization_strength) + quantized_start * quantization_strength
-        new_end = note["end_time"] * (1 - quantization_strength) + quantized_end * quantization_strength
-        
-        # Ensure minimum note duration
-        if new_end - new_start < MELODY_MIN_NOTE_DURATION:
-            new_end = new_start + MELODY_MIN_NOTE_DURATION
-        
-        quantized_note = note.copy()
-        quantized_note["start_time"] = float(new_start)
-        quantized_note["end_time"] = float(new_end)
-        quantized_note["duration"] = float(new_end - new_start)
-        
-        quantized_notes.append(quantized_note)
+    # Find nearest beat for start and end times
+    quantized_start = beats[_nearest_index(beats, notes["start"])]
+    quantized_end = beats[_nearest_index(beats, notes["end"])]
+    
+    # Apply quantization strength
+    new_start = notes["start"] * (1 - quantization_strength) + quantized_start * quantization_strength
+    new_end = notes["end"] * (1 - quantization_strength) + quantized_end * quantization_strength
+    
+    # Ensure minimum note duration
+    new_end = np.maximum(new_end, new_start + MELODY_MIN_NOTE_DURATION)
+    
+    quantized_notes = notes.copy()
+    quantized_notes["start"] = new_start
+    quantized_notes["end"] = new_end
+    quantized_notes["dur"] = new_end - new_start
     
     return quantized_notes
 
 
 def create_midi_from_notes(
-    notes: List[Dict[str, any]],
+    notes: NoteInput,
     tempo: float,
     output_path: str,
     track_name: str = "Melody"
@@ -205,7 +224,7 @@ def create_midi_from_notes(
     Create MIDI file from note data
     
     Args:
-        notes: List of note dictionaries
+        notes: Note array (NOTE_DTYPE) or list of note dictionaries
         tempo: Tempo in BPM
         output_path: Path to save MIDI file
         track_name: Name for the MIDI track
@@ -213,29 +232,25 @@ def create_midi_from_notes(
     Returns:
         PrettyMIDI object
     """
+    notes = _as_note_array(notes)
+
     # Create MIDI object
     midi = pretty_midi.PrettyMIDI(initial_tempo=float(tempo))
     
     # Create instrument
     instrument = pretty_midi.Instrument(program=0, name=track_name)  # Piano
     
-    # Add notes
-    for i, note_data in enumerate(notes):
-        start_val = float(note_data["start_time"])
-        end_val = float(note_data["end_time"])
-        
-        # Debug print for first note
-        if i == 0:
-            print(f"DEBUG: Note 0 start type: {type(start_val)}, value: {start_val}")
-            print(f"DEBUG: Note 0 end type: {type(end_val)}, value: {end_val}")
-            
-        note = pretty_midi.Note(
-            velocity=int(note_data["velocity"]),
-            pitch=int(note_data["pitch"]),
-            start=start_val,
-            end=end_val
+    # Add notes (columns -> Python scalars once, then one bulk extend)
+    Note = pretty_midi.Note
+    instrument.notes.extend([
+        Note(velocity=velocity, pitch=pitch, start=start_val, end=end_val)
+        for velocity, pitch, start_val, end_val in zip(
+            notes["vel"].tolist(),
+            notes["pitch"].tolist(),
+            notes["start"].tolist(),
+            notes["end"].tolist(),
         )
-        instrument.notes.append(note)
+    ])
     
     # Add instrument to MIDI
     midi.instruments.append(instrument)
@@ -293,17 +308,13 @@ def extract_melody_to_midi(
     midi = create_midi_from_notes(notes, tempo, output_path)
     
     # Calculate statistics
-    if notes:
-        pitches = [note["pitch"] for note in notes]
-        durations = [note["duration"] for note in notes]
-        confidences = [note["confidence"] for note in notes]
-        
+    if len(notes):
         stats = {
             "total_notes": len(notes),
-            "pitch_range": (min(pitches), max(pitches)),
-            "avg_duration": np.mean(durations),
-            "avg_confidence": np.mean(confidences),
-            "total_duration": sum(durations)
+            "pitch_range": (int(notes["pitch"].min()), int(notes["pitch"].max())),
+            "avg_duration": float(notes["dur"].mean()),
+            "avg_confidence": float(notes["conf"].mean()),
+            "total_duration": float(notes["dur"].sum())
         }
     else:
         stats = {
@@ -316,24 +327,25 @@ def extract_melody_to_midi(
     
     return {
         "midi_path": output_path,
-        "notes": notes,
+        "notes": _to_dicts(notes),
         "f0_data": f0_data,
         "tempo": tempo,
         "statistics": stats
     }
 
 
-def analyze_melody_characteristics(notes: List[Dict[str, any]]) -> Dict[str, any]:
+def analyze_melody_characteristics(notes: NoteInput) -> Dict[str, any]:
     """
     Analyze melody characteristics
     
     Args:
-        notes: List of note dictionaries
+        notes: Note array (NOTE_DTYPE) or list of note dictionaries
         
     Returns:
         Dictionary with melody analysis
     """
-    if not notes:
+    notes = _as_note_array(notes)
+    if len(notes) == 0:
         return {
             "pitch_range": 0,
             "melodic_intervals": [],
@@ -341,29 +353,26 @@ def analyze_melody_characteristics(notes: List[Dict[str, any]]) -> Dict[str, any
             "melody_density": 0.0
         }
     
-    pitches = [note["pitch"] for note in notes]
-    durations = [note["duration"] for note in notes]
+    pitches = notes["pitch"].astype(np.int32)
+    durations = notes["dur"]
     
     # Pitch range
-    pitch_range = max(pitches) - min(pitches)
+    pitch_range = np.ptp(pitches)
     
     # Melodic intervals
-    intervals = []
-    for i in range(1, len(pitches)):
-        interval = pitches[i] - pitches[i-1]
-        intervals.append(interval)
+    intervals = np.diff(pitches)
     
     # Rhythm diversity (standard deviation of durations)
-    rhythm_diversity = np.std(durations) if len(durations) > 1 else 0.0
+    rhythm_diversity = durations.std() if len(durations) > 1 else 0.0
     
     # Melody density (notes per second)
-    total_duration = sum(durations)
+    total_duration = float(durations.sum())
     melody_density = len(notes) / total_duration if total_duration > 0 else 0.0
     
     return {
         "pitch_range": int(pitch_range),
-        "melodic_intervals": intervals,
-        "avg_interval": float(np.mean(intervals)) if intervals else 0.0,
+        "melodic_intervals": intervals.tolist(),
+        "avg_interval": float(intervals.mean()) if len(intervals) else 0.0,
         "rhythm_diversity": float(rhythm_diversity),
         "melody_density": float(melody_density),
         "total_notes": len(notes)
@@ -371,43 +380,39 @@ def analyze_melody_characteristics(notes: List[Dict[str, any]]) -> Dict[str, any
 
 
 def filter_notes_by_confidence(
-    notes: List[Dict[str, any]],
+    notes: NoteInput,
     min_confidence: float = 0.7
-) -> List[Dict[str, any]]:
+) -> np.ndarray:
     """
     Filter notes by confidence threshold
     
     Args:
-        notes: List of note dictionaries
+        notes: Note array (NOTE_DTYPE) or list of note dictionaries
         min_confidence: Minimum confidence threshold
         
     Returns:
         Filtered notes
     """
-    return [note for note in notes if note["confidence"] >= min_confidence]
+    notes = _as_note_array(notes)
+    return notes[notes["conf"] >= min_confidence]
 
 
-def smooth_melody_line(notes: List[Dict[str, any]], window_size: int = 3) -> List[Dict[str, any]]:
+def smooth_melody_line(notes: NoteInput, window_size: int = 3) -> np.ndarray:
     """
     Smooth melody line using median filtering
     
     Args:
-        notes: List of note dictionaries
+        notes: Note array (NOTE_DTYPE) or list of note dictionaries
         window_size: Size of median filter window
         
     Returns:
         Smoothed notes
     """
+    notes = _as_note_array(notes)
     if len(notes) < window_size:
         return notes
     
-    pitches = [note["pitch"] for note in notes]
-    smoothed_pitches = medfilt(pitches, window_size)
-    
-    smoothed_notes = []
-    for i, note in enumerate(notes):
-        smoothed_note = note.copy()
-        smoothed_note["pitch"] = int(smoothed_pitches[i])
-        smoothed_notes.append(smoothed_note)
+    smoothed_notes = notes.copy()
+    smoothed_notes["pitch"] = medfilt(notes["pitch"].astype(np.float64), window_size)
     
     return smoothed_notes
@@ -2,20 +2,18 @@
 Stem separation utilities for Beat & Stems Lab
 Handles audio source separation using Spleeter and Demucs
 """
+import importlib.util
 import os
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 import librosa
 import soundfile as sf
 
-# Spleeter import - optional since we're using Demucs
-SPLEETER_AVAILABLE = False
-try:
-    from spleeter.separator import Separator
-    SPLEETER_AVAILABLE = True
-except ImportError:
-    pass
+# Spleeter - optional since we're using Demucs. Importing it loads TensorFlow,
+# so only probe for it here; StemSeparator imports it for spleeter methods
+SPLEETER_AVAILABLE = importlib.util.find_spec("spleeter") is not None
 
 try:
     import torch
@@ -43,6 +41,20 @@ def _get_demucs_device() -> str:
     return "cpu"
 
 
+def _normalized_mono(stem_audio: np.ndarray) -> np.ndarray:
+    """Average channels to mono and peak-normalize in place (one scan for the peak)."""
+    # Convert stereo to mono by averaging channels (fresh array, safe to modify)
+    if len(stem_audio.shape) > 1:
+        stem_mono = np.mean(stem_audio, axis=0)
+    else:
+        stem_mono = stem_audio
+
+    peak = float(np.abs(stem_mono).max()) if stem_mono.size else 0.0
+    if peak > 1e-8:
+        np.divide(stem_mono, peak, out=stem_mono)
+    return stem_mono
+
+
 class StemSeparator:
     """Handles audio stem separation using various methods"""
     
@@ -60,6 +72,8 @@ class StemSeparator:
             if not SPLEETER_AVAILABLE:
                 raise ImportError("Spleeter not available. Install with: pip install spleeter")
             
+            from spleeter.separator import Separator
+            
             # Extract the number of stems from method name
             stem_count = self.method.split(":")[1].replace("stems", "")
             self.separator = Separator(f'spleeter:{stem_count}stems')
@@ -101,46 +115,38 @@ class StemSeparator:
     
     def _separate_with_spleeter(self, audio: np.ndarray, sr: int) -> Dict[str, np.ndarray]:
         """Separate audio using Spleeter"""
+        # Ensure correct sample rate (resampling mono first is half the work)
+        if sr != SAMPLE_RATE:
+            audio = librosa.resample(audio, orig_sr=sr, target_sr=SAMPLE_RATE)
+
         # Spleeter expects stereo input
         if len(audio.shape) == 1:
             audio_stereo = np.stack([audio, audio])
         else:
             audio_stereo = audio
         
-        # Ensure correct sample rate
-        if sr != SAMPLE_RATE:
-            audio_stereo = librosa.resample(audio_stereo, orig_sr=sr, target_sr=SAMPLE_RATE)
-        
         # Perform separation
         prediction = self.separator.separate(audio_stereo)
         
         # Convert to mono and normalize
         stems = {}
         for stem_name, stem_audio in prediction.items():
-            # Convert stereo to mono by averaging channels
-            if len(stem_audio.shape) > 1:
-                stem_mono = np.mean(stem_audio, axis=0)
-            else:
-                stem_mono = stem_audio
-            
-            # Normalize
-            stem_mono = librosa.util.normalize(stem_mono)
-            stems[stem_name] = stem_mono
+            stems[stem_name] = _normalized_mono(stem_audio)
         
         return stems
     
     def _separate_with_demucs(self, audio: np.ndarray, sr: int) -> Dict[str, np.ndarray]:
         """Separate audio using Demucs"""
+        # Ensure correct sample rate (resampling mono first is half the work)
+        if sr != SAMPLE_RATE:
+            audio = librosa.resample(audio, orig_sr=sr, target_sr=SAMPLE_RATE)
+
         # Demucs expects specific input format
         if len(audio.shape) == 1:
             audio_stereo = np.stack([audio, audio])
         else:
             audio_stereo = audio
         
-        # Ensure correct sample rate
-        if sr != SAMPLE_RATE:
-            audio_stereo = librosa.resample(audio_stereo, orig_sr=sr, target_sr=SAMPLE_RATE)
-        
         # Convert to torch tensor
         audio_tensor = torch.from_numpy(audio_stereo).unsqueeze(0)  # Add batch dimension
         
@@ -161,17 +167,7 @@ class StemSeparator:
             stem_names = ['drums', 'bass', 'other', 'vocals', 'piano']
         
         for i, stem_name in enumerate(stem_names):
-            stem_audio = separated[i].numpy()
-            
-            # Convert stereo to mono
-            if len(stem_audio.shape) > 1:
-                stem_mono = np.mean(stem_audio, axis=0)
-            else:
-                stem_mono = stem_audio
-            
-            # Normalize
-            stem_mono = librosa.util.normalize(stem_mono)
-            stems[stem_name] = stem_mono
+            stems[stem_name] = _normalized_mono(separated[i].numpy())
         
         return stems
     
@@ -218,12 +214,21 @@ def separate_audio_file(
     # Perform separation
     stems = separator.separate_audio(audio, sr)
     
-    # Save stems
-    stem_paths = {}
-    for stem_name, stem_audio in stems.items():
-        output_path = output_dir / f"{stem_name}.{EXPORT_FORMAT}"
-        save_audio_file(stem_audio, output_path, EXPORT_SAMPLE_RATE)
-        stem_paths[stem_name] = output_path
+    # Save stems concurrently — encoding/writing is I/O-bound and independent per stem
+    stem_paths = {
+        stem_name: output_dir / f"{stem_name}.{EXPORT_FORMAT}"
+        for stem_name in stems
+    }
+    if not stems:
+        return stem_paths
+
+    with ThreadPoolExecutor(max_workers=len(stems)) as pool:
+        futures = [
+            pool.submit(save_audio_file, stem_audio, stem_paths[stem_name], EXPORT_SAMPLE_RATE)
+            for stem_name, stem_audio in stems.items()
+        ]
+        for future in futures:
+            future.result()
     
     return stem_paths
 
@@ -213,10 +213,12 @@ def generate_stem_remix_js(
     output_path: Path,
     base_url: str = "http://localhost:8765/",
     mode: str = "recreate",
+    blocks: Optional[Dict[str, Any]] = None,
 ) -> str:
     """
     Generate Strudel code using real stem slices.
     mode: 'recreate' (original order) or 'remix' (shuffled/euclidean)
+    blocks: optional precomputed StrudelPatternGenerator._extract_blocks result
     """
     from src.strudel_integration import StrudelPatternGenerator, bpm_to_cpm
 
@@ -225,7 +227,8 @@ def generate_stem_remix_js(
     key = analysis_data.get("key", "unknown")
 
     gen = StrudelPatternGenerator()
-    blocks = gen._extract_blocks(analysis_data)
+    if blocks is None:
+        blocks = gen._extract_blocks(analysis_data)
     synth_defs = gen._blocks_sound_defs(blocks)
 
     sample_maps: List[str] = []
@@ -290,6 +293,7 @@ def generate_stem_assets(
     project_name: str,
     analysis_data: Dict[str, Any],
     stem_paths: Optional[Dict[str, str]] = None,
+    blocks: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, str]:
     """Full pipeline: slice stems, copy to static, write serve script + stem_remix.js."""
     beat_times = analysis_data.get("beat_times") or analysis_data.get("tempo_beats", {}).get("beat_times", [])
@@ -303,16 +307,22 @@ def generate_stem_assets(
     static_path = copy_slices_to_static(project_path, project_name)
     serve_script = generate_serve_samples_py(project_path)
 
+    if blocks is None:
+        from src.strudel_integration import StrudelPatternGenerator
+
+        # Shared by all three stem_remix variants below
+        blocks = StrudelPatternGenerator()._extract_blocks(analysis_data)
+
     strudel_dir = project_path / "strudel"
     recreate_path = strudel_dir / "stem_remix.js"
     remix_path = strudel_dir / "stem_remix_shuffle.js"
 
-    generate_stem_remix_js(manifest, analysis_data, recreate_path, "http://localhost:8765/", "recreate")
-    generate_stem_remix_js(manifest, analysis_data, remix_path, "http://localhost:8765/", "remix")
+    generate_stem_remix_js(manifest, analysis_data, recreate_path, "http://localhost:8765/", "recreate", blocks=blocks)
+    generate_stem_remix_js(manifest, analysis_data, remix_path, "http://localhost:8765/", "remix", blocks=blocks)
 
     # Streamlit-friendly variant (static serving path)
     st_path = strudel_dir / "stem_remix_streamlit.js"
-    generate_stem_remix_js(manifest, analysis_data, st_path, f"/app/static/slices/{_safe_dirname(project_name)}/", "recreate")
+    generate_stem_remix_js(manifest, analysis_data, st_path, f"/app/static/slices/{_safe_dirname(project_name)}/", "recreate", blocks=blocks)
 
     return {
         "manifest": str(project_path / "slices" / "manifest.json"),
@@ -4,14 +4,17 @@ Generates Strudel code patterns based on audio analysis with high-fidelity seque
 """
 import json
 import math
-import bisect
+import string
+import functools
 import urllib.parse
 import numpy as np
 from collections import Counter
-from typing import Dict, List, Any, Optional, Tuple
+from types import MappingProxyType
+from typing import Dict, List, Any, Optional, Tuple, Union
 from pathlib import Path
 from .strudel_templates import get_strudel_templates
 from .strudel_patterns import (
+    NOTE_NAMES,
     compress_mini_notation,
     detect_swing,
     parse_key_to_scale,
@@ -33,61 +36,77 @@ _DEFAULT_BASS = '"c2 ~ g1 ~ c2 ~ g1 ~"'
 _DEFAULT_MELODY = '"c4 ~ e4 ~ g4 ~ e4 ~"'
 _DEFAULT_CHORD = '"C Am F G"'
 
+# Strudel note name for every MIDI number, e.g. 60 -> "c4"
+_NOTE_TABLE = tuple(f"{NOTE_NAMES[m % 12]}{(m // 12) - 1}" for m in range(128))
+
+# (tempo, duration, beat_times, key, cpm) as returned by _get_analysis_context
+AnalysisContext = Tuple[float, float, Optional[List[float]], str, float]
+
+
+@functools.lru_cache(maxsize=32)
+def _scale_for_key(key: str) -> Tuple[str, List[int]]:
+    """parse_key_to_scale, memoized: the same key is resolved for every quantize pass."""
+    return parse_key_to_scale(key)
+
+
+# Drum hit type -> Strudel sample name (read-only, shared by all generators)
+_DRUM_SAMPLES = MappingProxyType({
+    "kick": "bd",
+    "snare": "sd",
+    "hat": "hh",
+    "hihat": "hh",
+    "open_hat": "oh",
+    "closed_hat": "hh",
+    "crash": "cp",
+    "ride": "rd",
+})
+
 
 class StrudelPatternGenerator:
     """Generates Strudel patterns from audio analysis data using step sequencing"""
     
+    drum_samples = _DRUM_SAMPLES
+
     def __init__(self):
-        self.drum_samples = {
-            "kick": "bd",
-            "snare": "sd",
-            "hat": "hh",
-            "hihat": "hh",
-            "open_hat": "oh",
-            "closed_hat": "hh",
-            "crash": "cp",
-            "ride": "rd",
-        }
         self.templates = get_strudel_templates()
     
     def _time_to_grid(self, time_sec: float, beat_duration: float, steps_per_beat: int = 4, beat_times: Optional[List[float]] = None) -> int:
         """Convert time in seconds to grid index, using actual beat times if available"""
-        if beat_times and len(beat_times) > 0:
-            # Find the nearest beat
-            idx = bisect.bisect_left(beat_times, time_sec)
-            if idx == 0:
-                nearest_beat = beat_times[0]
-                beat_idx = 0
-            elif idx == len(beat_times):
-                nearest_beat = beat_times[-1]
-                beat_idx = len(beat_times) - 1
-            else:
-                # Choose closer beat
-                if abs(time_sec - beat_times[idx-1]) < abs(time_sec - beat_times[idx]):
-                    nearest_beat = beat_times[idx-1]
-                    beat_idx = idx - 1
-                else:
-                    nearest_beat = beat_times[idx]
-                    beat_idx = idx
-            
+        return int(self._times_to_grid(np.array([time_sec], dtype=np.float64), beat_duration, steps_per_beat, beat_times)[0])
+
+    @staticmethod
+    def _times_to_grid(
+        times: np.ndarray,
+        beat_duration: float,
+        steps_per_beat: int = 4,
+        beat_times: Optional[List[float]] = None,
+    ) -> np.ndarray:
+        """Vectorized _time_to_grid: map an array of times to global 16th-step indices."""
+        if beat_times is not None and len(beat_times) > 0:
+            beats = np.asarray(beat_times, dtype=np.float64)
+            last = len(beats) - 1
+
+            # Find the nearest beat (ties go to the later beat)
+            idx = np.searchsorted(beats, times, side="left")
+            left = np.clip(idx - 1, 0, last)
+            right = np.minimum(idx, last)
+            closer_left = np.abs(times - beats[left]) < np.abs(times - beats[right])
+            beat_idx = np.where(closer_left & (idx > 0), left, right)
+
             # Calculate sub-beat position (16th notes within the beat)
-            if beat_idx < len(beat_times) - 1:
-                next_beat = beat_times[beat_idx + 1]
-                beat_dur = next_beat - nearest_beat
-                if beat_dur > 0:
-                    sub_beat = (time_sec - nearest_beat) / beat_dur
-                    sub_step = int(round(sub_beat * steps_per_beat))
-                    sub_step = max(0, min(steps_per_beat - 1, sub_step))
-                else:
-                    sub_step = 0
-            else:
-                sub_step = 0
-            
-            return beat_idx * steps_per_beat + sub_step
-        
+            nearest_beat = beats[beat_idx]
+            beat_dur = beats[np.minimum(beat_idx + 1, last)] - nearest_beat
+            has_next = (beat_idx < last) & (beat_dur > 0)
+            sub_beat = (times - nearest_beat) / np.where(has_next, beat_dur, 1.0)
+            sub_step = np.clip(np.round(sub_beat * steps_per_beat), 0, steps_per_beat - 1)
+            sub_step = np.where(has_next, sub_step, 0)
+
+            return (beat_idx * steps_per_beat + sub_step).astype(np.int64)
+
         # Fallback to calculated beat duration
-        if beat_duration <= 0: return 0
-        return int(round((time_sec / beat_duration) * steps_per_beat))
+        if beat_duration <= 0:
+            return np.zeros(len(times), dtype=np.int64)
+        return np.round((times / beat_duration) * steps_per_beat).astype(np.int64)
 
     def _quantize_to_bars(
         self,
@@ -112,7 +131,7 @@ class StrudelPatternGenerator:
         if duration <= 0:
             duration = 60
 
-        root, scale = parse_key_to_scale(snap_key or "C major")
+        root, scale = _scale_for_key(snap_key or "C major")
 
         if beat_times and len(beat_times) > 0:
             total_beats = len(beat_times)
@@ -122,15 +141,20 @@ class StrudelPatternGenerator:
 
         grid = [["~" for _ in range(steps_per_bar)] for _ in range(total_bars)]
         gain_grid = [[1.0 for _ in range(steps_per_bar)] for _ in range(total_bars)]
-        occupied = [[False for _ in range(steps_per_bar)] for _ in range(total_bars)]
+        # Steps covered by an earlier note's duration, one bitmask per bar (bit i = step i)
+        occupied = [0] * total_bars
+        stacked: Dict[Tuple[int, int], List[str]] = {}
+
+        times = np.fromiter(
+            (event.get("time", 0) for event in events), dtype=np.float64, count=len(events)
+        )
+        global_steps = self._times_to_grid(times, beat_duration, steps_per_beat, beat_times)
 
-        for event in events:
-            t = event.get("time", 0)
+        for event, global_step in zip(events, global_steps.tolist()):
             val = event.get("value", "")
             if snap_key and val and val != "~":
                 val = snap_note_to_scale(val, root, scale)
 
-            global_step = self._time_to_grid(t, beat_duration, steps_per_beat, beat_times)
             bar_idx = global_step // steps_per_bar
             step_idx = global_step % steps_per_bar
 
@@ -146,22 +170,27 @@ class StrudelPatternGenerator:
                 val = f"{val}@{dur_steps}"
 
             current = grid[bar_idx][step_idx]
-            if current == "~" and not occupied[bar_idx][step_idx]:
+            if current == "~" and not (occupied[bar_idx] >> step_idx) & 1:
                 grid[bar_idx][step_idx] = val
                 gain_grid[bar_idx][step_idx] = gain
-                for ds in range(1, min(dur_steps, steps_per_bar - step_idx)):
-                    occupied[bar_idx][step_idx + ds] = True
+                held = min(dur_steps, steps_per_bar - step_idx) - 1
+                if held > 0:
+                    occupied[bar_idx] |= ((1 << held) - 1) << (step_idx + 1)
             elif current == "~":
                 continue
             else:
-                if current.startswith("[") and current.endswith("]"):
-                    content = current[1:-1]
-                    grid[bar_idx][step_idx] = f"[{content},{val}]"
+                # Collect simultaneous hits; the "[a,b,...]" string is built once below
+                cell = (bar_idx, step_idx)
+                if cell in stacked:
+                    stacked[cell].append(val)
                 else:
-                    grid[bar_idx][step_idx] = f"[{current},{val}]"
+                    stacked[cell] = [current, val]
                 if use_gain:
                     gain_grid[bar_idx][step_idx] = max(gain_grid[bar_idx][step_idx], gain)
 
+        for (bar_idx, step_idx), vals in stacked.items():
+            grid[bar_idx][step_idx] = f"[{','.join(vals)}]"
+
         if not use_gain:
             gain_grid = [[1.0] * steps_per_bar for _ in range(total_bars)]
 
@@ -181,50 +210,42 @@ class StrudelPatternGenerator:
 
     def _get_events_from_drums(self, drum_analysis: Dict[str, Any]) -> List[Dict]:
         drum_hits = drum_analysis.get("drum_hits", [])
-        events = []
-        for hit in drum_hits:
-            dtype = hit.get("type")
-            sample = self.drum_samples.get(dtype)
-            if sample:
-                events.append({
-                    "time": hit["time"],
-                    "value": sample,
-                    "gain": hit.get("gain", hit.get("strength", 1.0)),
-                })
-        return events
+        # Bind the lookups once; this runs for every hit of every layer pass
+        sample_for = self.drum_samples.get
+        return [
+            {
+                "time": hit["time"],
+                "value": sample,
+                "gain": hit.get("gain", hit.get("strength", 1.0)),
+            }
+            for hit in drum_hits
+            if (sample := sample_for(hit.get("type")))
+        ]
 
     def _get_events_from_melody(self, melody_analysis: Dict[str, Any]) -> List[Dict]:
-        notes = melody_analysis.get("notes", [])
-        events = []
-        for note in notes:
-            midi_note = note.get("pitch")
-            start_time = note.get("start_time")
-            if midi_note is not None and start_time is not None:
-                note_name = self._midi_to_strudel_note(midi_note)
-                events.append({
-                    "time": start_time,
-                    "value": note_name,
-                    "duration": note.get("duration", 0.1),
-                })
-        return events
+        return self._get_note_events(melody_analysis.get("notes", []))
 
     def _get_events_from_chords(self, chord_analysis: Dict[str, Any]) -> List[Dict]:
         times = chord_analysis.get("chord_times", [])
         labels = chord_analysis.get("chord_labels", [])
-        events = []
-        for t, label in zip(times, labels):
-            clean_label = label.replace(":", "")
-            events.append({"time": t, "value": clean_label})
-        return events
+        return [
+            {"time": t, "value": label.replace(":", "")}
+            for t, label in zip(times, labels)
+        ]
 
     def _get_events_from_bass(self, bass_analysis: Dict[str, Any]) -> List[Dict]:
-        notes = bass_analysis.get("notes", [])
+        return self._get_note_events(bass_analysis.get("notes", []))
+
+    def _get_note_events(self, notes: List[Dict[str, Any]]) -> List[Dict]:
+        """Note dicts -> grid events, naming pitches via the precomputed _NOTE_TABLE."""
+        table = _NOTE_TABLE
         events = []
         for note in notes:
             midi_note = note.get("pitch")
             start_time = note.get("start_time")
             if midi_note is not None and start_time is not None:
-                note_name = self._midi_to_strudel_note(midi_note)
+                midi_note = int(midi_note)
+                note_name = table[midi_note] if 0 <= midi_note < 128 else self._midi_to_strudel_note(midi_note)
                 events.append({
                     "time": start_time,
                     "value": note_name,
@@ -342,10 +363,11 @@ class StrudelPatternGenerator:
 ])){swing_line}.sound("gm_synth_bass_1").lpf(400).gain(1.2)"""
 
     def _midi_to_strudel_note(self, midi_note: int) -> str:
-        note_names = ['c', 'c#', 'd', 'd#', 'e', 'f', 'f#', 'g', 'g#', 'a', 'a#', 'b']
-        octave = (int(midi_note) // 12) - 1
-        note_name = note_names[int(midi_note) % 12]
-        return f"{note_name}{octave}"
+        midi_note = int(midi_note)
+        if 0 <= midi_note < 128:
+            return _NOTE_TABLE[midi_note]
+        octave = (midi_note // 12) - 1
+        return f"{NOTE_NAMES[midi_note % 12]}{octave}"
 
     def extract_most_common_pattern(
         self,
@@ -460,7 +482,7 @@ class StrudelPatternGenerator:
 
     def _get_analysis_context(
         self, analysis_data: Dict[str, Any]
-    ) -> Tuple[float, float, Optional[List[float]], str, float]:
+    ) -> AnalysisContext:
         tempo = analysis_data.get("tempo", 120)
         duration = analysis_data.get("duration", 60)
         if not isinstance(tempo, (int, float)):
@@ -489,41 +511,28 @@ class StrudelPatternGenerator:
         bass_events = self._get_events_from_bass(analysis_data.get("bass", {}))
         chord_events = self._get_events_from_chords(analysis_data.get("chords", {}))
 
-        d_main, d_gain = self.extract_top_patterns(
-            drum_events, tempo, duration, beat_times=beat_times, use_gain=True
-        )[0]
-        d_var, d_var_gain = self.extract_top_patterns(
+        # One scoring pass per layer yields both the main pattern and its variant
+        (d_main, d_gain), (d_var, d_var_gain) = self.extract_top_patterns(
             drum_events, tempo, duration, beat_times=beat_times, use_gain=True
-        )[1]
+        )
 
-        m_main, _ = self.extract_top_patterns(
-            melody_events, tempo, duration, beat_times=beat_times,
-            use_durations=True, snap_key=key,
-        )[0]
-        m_var, _ = self.extract_top_patterns(
+        (m_main, _), (m_var, _) = self.extract_top_patterns(
             melody_events, tempo, duration, beat_times=beat_times,
             use_durations=True, snap_key=key,
-        )[1]
+        )
 
         if bass_events:
-            b_main, _ = self.extract_top_patterns(
+            (b_main, _), (b_var, _) = self.extract_top_patterns(
                 bass_events, tempo, duration, beat_times=beat_times,
                 use_durations=True, snap_key=key,
-            )[0]
-            b_var, _ = self.extract_top_patterns(
-                bass_events, tempo, duration, beat_times=beat_times,
-                use_durations=True, snap_key=key,
-            )[1]
+            )
         else:
             b_main, b_var = "\"~\"", "\"~\""
 
         if chord_events:
-            c_main, _ = self.extract_top_patterns(
-                chord_events, tempo, duration, steps_per_beat=1, beat_times=beat_times
-            )[0]
-            c_var, _ = self.extract_top_patterns(
+            (c_main, _), (c_var, _) = self.extract_top_patterns(
                 chord_events, tempo, duration, steps_per_beat=1, beat_times=beat_times
-            )[1]
+            )
         else:
             c_main, c_var = "\"~\"", "\"~\""
 
@@ -536,8 +545,11 @@ class StrudelPatternGenerator:
         c_main = self._pattern_or_fallback(c_main, _DEFAULT_CHORD)
         c_var = self._pattern_or_fallback(c_var, c_main)
 
+        context = (tempo, duration, beat_times, key, cpm)
+        sections = self.detect_sections(analysis_data, context=context, drum_events=drum_events)
         section_patterns = self._extract_section_patterns(
-            analysis_data, drum_events, melody_events, bass_events, chord_events, key
+            analysis_data, drum_events, melody_events, bass_events, chord_events, key,
+            context=context, sections=sections,
         )
 
         drum_swing = detect_swing(drum_events, tempo, beat_times)
@@ -562,6 +574,7 @@ class StrudelPatternGenerator:
             "melody_variant": m_var,
             "chord_main": c_main,
             "chord_variant": c_var,
+            "sections": sections,
             "section_patterns": section_patterns,
         }
 
@@ -573,10 +586,15 @@ class StrudelPatternGenerator:
         bass_events: List[Dict],
         chord_events: List[Dict],
         key: str,
+        context: Optional[AnalysisContext] = None,
+        sections: Optional[List[Tuple[int, str]]] = None,
     ) -> Dict[str, Dict[str, str]]:
         """Extract dominant patterns per section label (intro/verse/chorus)."""
-        tempo, duration, beat_times, _, _ = self._get_analysis_context(analysis_data)
-        sections = self.detect_sections_with_ranges(analysis_data)
+        context = context or self._get_analysis_context(analysis_data)
+        tempo, duration, beat_times, _, _ = context
+        if sections is None:
+            sections = self.detect_sections(analysis_data, context=context, drum_events=drum_events)
+        sections = self._sections_with_ranges(sections)
         result: Dict[str, Dict[str, str]] = {}
 
         for sec in sections:
@@ -613,10 +631,18 @@ class StrudelPatternGenerator:
         return result
 
     def detect_sections_with_ranges(
-        self, analysis_data: Dict[str, Any], max_sections: int = 12
+        self,
+        analysis_data: Dict[str, Any],
+        max_sections: int = 12,
+        context: Optional[AnalysisContext] = None,
     ) -> List[Dict[str, Any]]:
         """Return sections with bar counts, labels, and bar index ranges."""
-        flat = self.detect_sections(analysis_data, max_sections)
+        return self._sections_with_ranges(
+            self.detect_sections(analysis_data, max_sections, context=context)
+        )
+
+    @staticmethod
+    def _sections_with_ranges(flat: List[Tuple[int, str]]) -> List[Dict[str, Any]]:
         sections: List[Dict[str, Any]] = []
         bar_start = 0
         for bars, label in flat:
@@ -629,12 +655,17 @@ class StrudelPatternGenerator:
         return sections
 
     def detect_sections(
-        self, analysis_data: Dict[str, Any], max_sections: int = 12
+        self,
+        analysis_data: Dict[str, Any],
+        max_sections: int = 12,
+        context: Optional[AnalysisContext] = None,
+        drum_events: Optional[List[Dict]] = None,
     ) -> List[Tuple[int, str]]:
         """Label bars by drum density and collapse into intro / verse / chorus sections."""
         default = [(4, "intro"), (8, "verse"), (4, "chorus"), (8, "verse"), (4, "chorus")]
-        tempo, duration, beat_times, _, _ = self._get_analysis_context(analysis_data)
-        drum_events = self._get_events_from_drums(analysis_data.get("drums", {}))
+        tempo, duration, beat_times, _, _ = context or self._get_analysis_context(analysis_data)
+        if drum_events is None:
+            drum_events = self._get_events_from_drums(analysis_data.get("drums", {}))
 
         if not drum_events:
             return default
@@ -756,9 +787,15 @@ let chordsB = chord(chord_alt).sound("sawtooth").lpf(700).room(0.5).sustain(2)
 // --- SECTION STACKS (per-section extracted patterns) ---
 {section_stacks}let breakdown = drumsB"""
 
-    def generate_building_blocks_code(self, analysis_data: Dict[str, Any]) -> str:
-        """Named building blocks — solo any layer or play the full stack."""
-        blocks = self._extract_blocks(analysis_data)
+    def generate_building_blocks_code(
+        self, analysis_data: Dict[str, Any], blocks: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Named building blocks — solo any layer or play the full stack.
+
+        Pass `blocks` from _extract_blocks to reuse an extraction already done.
+        """
+        if blocks is None:
+            blocks = self._extract_blocks(analysis_data)
         tempo, cpm, key = blocks["tempo"], blocks["cpm"], blocks["key"]
 
         return f"""// 🧱 Building Blocks
@@ -781,11 +818,14 @@ setcpm({cpm:.2f});
 chorus
 """
 
-    def generate_arrangement_code(self, analysis_data: Dict[str, Any]) -> str:
+    def generate_arrangement_code(
+        self, analysis_data: Dict[str, Any], blocks: Optional[Dict[str, Any]] = None
+    ) -> str:
         """Song structure using arrange() — intro / verse / chorus from energy heuristics."""
-        blocks = self._extract_blocks(analysis_data)
+        if blocks is None:
+            blocks = self._extract_blocks(analysis_data)
         tempo, cpm, key, duration = blocks["tempo"], blocks["cpm"], blocks["key"], blocks["duration"]
-        sections = self.detect_sections(analysis_data)
+        sections = blocks["sections"]
 
         arrange_lines = []
         for bars, label in sections:
@@ -817,11 +857,17 @@ arrange(
         """Alias for building blocks (legacy filename loops.js)."""
         return self.generate_building_blocks_code(analysis_data)
 
-    def generate_remix_files(self, analysis_data: Dict[str, Any], output_dir: str):
+    def generate_remix_files(
+        self,
+        analysis_data: Dict[str, Any],
+        output_dir: str,
+        blocks: Optional[Dict[str, Any]] = None,
+    ):
         """Generate ready-to-use remix files via the remix engine."""
         from .remix_engine import generate_all_remix_files
 
-        blocks = self._extract_blocks(analysis_data)
+        if blocks is None:
+            blocks = self._extract_blocks(analysis_data)
         generate_all_remix_files(blocks, output_dir)
 
     def generate_complete_song(self, analysis_data: Dict[str, Any]) -> str:
@@ -830,75 +876,72 @@ arrange(
 
     # Compatibility methods for existing interface
     def save_strudel_code(self, code: str, path: str):
-        Path(path).parent.mkdir(parents=True, exist_ok=True)
-        with open(path, 'w') as f: f.write(code)
+        output_file = Path(path)
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        output_file.write_text(code, encoding="utf-8")
 
     def create_strudel_html(self, code: str, title: str) -> str:
         return create_strudel_html(code, title)
 
-def create_strudel_html(code: str, title: str) -> str:
-    """Generate HTML player for Strudel code - uses Strudel REPL iframe for reliability"""
-    # URL encode the code for Strudel REPL
-    encoded_code = urllib.parse.quote(code)
-    strudel_repl_url = f"https://strudel.cc/?code={encoded_code}"
-    
-    # Escape HTML special characters for display
-    escaped_code = code.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-    
-    return f"""<!DOCTYPE html>
+
+# Escape table for code shown in the player's <textarea>
+_HTML_ESCAPE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+# Strudel player page; placeholders: $title, $repl_url, $code
+_HTML_TEMPLATE = string.Template("""<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{title}</title>
+    <title>$title</title>
     <style>
-        body {{ 
+        body { 
             background: #111; 
             color: #fff; 
             font-family: sans-serif; 
             padding: 20px; 
             margin: 0;
-        }}
-        .container {{
+        }
+        .container {
             max-width: 1400px;
             margin: 0 auto;
-        }}
-        h1 {{ 
+        }
+        h1 { 
             text-align: center; 
             color: #0f0; 
             margin-bottom: 20px;
-        }}
-        .tabs {{
+        }
+        .tabs {
             display: flex;
             gap: 10px;
             margin-bottom: 20px;
-        }}
-        .tab-btn {{
+        }
+        .tab-btn {
             padding: 10px 20px;
             background: #333;
             color: #fff;
             border: 1px solid #555;
             cursor: pointer;
             border-radius: 5px 5px 0 0;
-        }}
-        .tab-btn.active {{
+        }
+        .tab-btn.active {
             background: #0f0;
             color: #000;
-        }}
-        .tab-content {{
+        }
+        .tab-content {
             display: none;
-        }}
-        .tab-content.active {{
+        }
+        .tab-content.active {
             display: block;
-        }}
-        iframe {{
+        }
+        iframe {
             width: 100%;
             height: 800px;
             border: 2px solid #0f0;
             border-radius: 5px;
             background: #000;
-        }}
-        textarea {{
+        }
+        textarea {
             width: 100%;
             height: 600px;
             background: #222;
@@ -908,8 +951,8 @@ def create_strudel_html(code: str, title: str) -> str:
             font-size: 14px;
             padding: 10px;
             box-sizing: border-box;
-        }}
-        .copy-btn {{
+        }
+        .copy-btn {
             padding: 10px 20px;
             margin-top: 10px;
             background: #0f0;
@@ -918,51 +961,51 @@ def create_strudel_html(code: str, title: str) -> str:
             cursor: pointer;
             font-weight: bold;
             border-radius: 5px;
-        }}
-        .copy-btn:hover {{
+        }
+        .copy-btn:hover {
             background: #0a0;
-        }}
-        .tips {{
+        }
+        .tips {
             background: #333;
             padding: 15px;
             margin-bottom: 20px;
             border-radius: 5px;
             border: 1px solid #555;
-        }}
-        .tips strong {{
+        }
+        .tips strong {
             color: #0f0;
-        }}
-        .tips a {{
+        }
+        .tips a {
             color: #0ff;
             text-decoration: underline;
-        }}
+        }
     </style>
     <script>
-        function switchTab(tabName) {{
+        function switchTab(tabName) {
             // Hide all tabs
-            document.querySelectorAll('.tab-content').forEach(tab => {{
+            document.querySelectorAll('.tab-content').forEach(tab => {
                 tab.classList.remove('active');
-            }});
-            document.querySelectorAll('.tab-btn').forEach(btn => {{
+            });
+            document.querySelectorAll('.tab-btn').forEach(btn => {
                 btn.classList.remove('active');
-            }});
+            });
             
             // Show selected tab
             document.getElementById('tab_' + tabName).classList.add('active');
             document.getElementById('btn_' + tabName).classList.add('active');
-        }}
+        }
         
-        function copyCode() {{
+        function copyCode() {
             const code = document.getElementById('code').value;
-            navigator.clipboard.writeText(code).then(() => {{
+            navigator.clipboard.writeText(code).then(() => {
                 alert('Code copied to clipboard! Paste it into strudel.cc');
-            }});
-        }}
+            });
+        }
     </script>
 </head>
 <body>
     <div class="container">
-        <h1>{title}</h1>
+        <h1>$title</h1>
         
         <div class="tips">
             <strong>💡 How to Use:</strong><br>
@@ -977,16 +1020,46 @@ def create_strudel_html(code: str, title: str) -> str:
         </div>
         
         <div id="tab_repl" class="tab-content active">
-            <iframe src="{strudel_repl_url}" title="Strudel REPL"></iframe>
+            <iframe src="$repl_url" title="Strudel REPL"></iframe>
         </div>
         
         <div id="tab_code" class="tab-content">
-            <textarea id="code">{escaped_code}</textarea>
+            <textarea id="code">$code</textarea>
             <button class="copy-btn" onclick="copyCode()">📋 Copy Code to Clipboard</button>
         </div>
     </div>
 </body>
-</html>"""
+</html>""")
+
+
+@functools.lru_cache(maxsize=32)
+def create_strudel_html(code: str, title: str) -> str:
+    """Generate HTML player for Strudel code - uses Strudel REPL iframe for reliability
+
+    Memoized on (code, title): re-exporting unchanged code skips the quoting/escaping.
+    """
+    # URL encode the code for Strudel REPL
+    encoded_code = urllib.parse.quote(code)
+    strudel_repl_url = f"https://strudel.cc/?code={encoded_code}"
+    
+    return _HTML_TEMPLATE.substitute(
+        title=title,
+        repl_url=strudel_repl_url,
+        code=code.translate(_HTML_ESCAPE),  # escape HTML special characters for display
+    )
+
+
+def _write_text_files(items: List[Tuple[Path, str]]) -> None:
+    """Write (path, text) pairs; parent directories must already exist."""
+    for path, text in items:
+        path.write_text(text, encoding="utf-8")
+
+
+@functools.lru_cache(maxsize=1)
+def _generator() -> StrudelPatternGenerator:
+    """Shared generator instance (it holds no per-song state)."""
+    return StrudelPatternGenerator()
+
 
 def generate_strudel_from_analysis(
     analysis_data: Dict[str, Any],
@@ -994,42 +1067,49 @@ def generate_strudel_from_analysis(
     project_path: Optional[str] = None,
     project_name: Optional[str] = None,
     stem_paths: Optional[Dict[str, str]] = None,
-) -> Dict[str, str]:
-    """Main entry point: building blocks, arrangement, remixes, stem slices."""
-    generator = StrudelPatternGenerator()
+    with_contents: bool = False,
+) -> Union[Dict[str, str], Tuple[Dict[str, str], Dict[str, str]]]:
+    """Main entry point: building blocks, arrangement, remixes, stem slices.
+
+    Returns the output paths by key. With ``with_contents=True`` returns
+    ``(files, contents)``, where contents holds the generated building_blocks/
+    arrangement code under the same keys, so callers need not read them back.
+    """
+    generator = _generator()
     out_path = Path(output_dir)
     out_path.mkdir(parents=True, exist_ok=True)
     files: Dict[str, str] = {}
 
-    blocks_code = generator.generate_building_blocks_code(analysis_data)
-    blocks_path = out_path / "building_blocks.js"
-    generator.save_strudel_code(blocks_code, str(blocks_path))
-    files["building_blocks"] = str(blocks_path)
+    # Pattern extraction is the expensive part; do it once for every output below
+    blocks = generator._extract_blocks(analysis_data)
+    blocks_code = generator.generate_building_blocks_code(analysis_data, blocks=blocks)
+    arr_code = generator.generate_arrangement_code(analysis_data, blocks=blocks)
+    html_code = generator.create_strudel_html(arr_code, "Arrangement")
+    blocks_html = generator.create_strudel_html(blocks_code, "Building Blocks")
 
-    arr_code = generator.generate_arrangement_code(analysis_data)
+    blocks_path = out_path / "building_blocks.js"
     arr_path = out_path / "arrangement.js"
-    generator.save_strudel_code(arr_code, str(arr_path))
-    files["arrangement"] = str(arr_path)
-
     # Legacy keys for older UI/tests
     loops_path = out_path / "loops.js"
-    generator.save_strudel_code(blocks_code, str(loops_path))
-    files["loops"] = str(loops_path)
-
-    html_code = generator.create_strudel_html(arr_code, "Arrangement")
     html_path = out_path / "strudel_player.html"
-    with open(html_path, "w") as f:
-        f.write(html_code)
-    files["html"] = str(html_path)
-
-    blocks_html = generator.create_strudel_html(blocks_code, "Building Blocks")
     blocks_html_path = out_path / "strudel_blocks.html"
-    with open(blocks_html_path, "w") as f:
-        f.write(blocks_html)
+
+    _write_text_files([
+        (blocks_path, blocks_code),
+        (arr_path, arr_code),
+        (loops_path, blocks_code),
+        (html_path, html_code),
+        (blocks_html_path, blocks_html),
+    ])
+
+    files["building_blocks"] = str(blocks_path)
+    files["arrangement"] = str(arr_path)
+    files["loops"] = str(loops_path)
+    files["html"] = str(html_path)
     files["blocks_html"] = str(blocks_html_path)
     files["loops_html"] = str(blocks_html_path)
 
-    generator.generate_remix_files(analysis_data, str(out_path))
+    generator.generate_remix_files(analysis_data, str(out_path), blocks=blocks)
     for remix_path in sorted(out_path.glob("remix_*.js")):
         files[remix_path.stem] = str(remix_path)
 
@@ -1042,9 +1122,12 @@ def generate_strudel_from_analysis(
                 project_name,
                 analysis_data,
                 stem_paths=stem_paths,
+                blocks=blocks,
             )
             files.update(stem_files)
         except Exception:
             pass
 
+    if with_contents:
+        return files, {"building_blocks": blocks_code, "arrangement": arr_code}
     return files
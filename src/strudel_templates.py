@@ -2,24 +2,73 @@
 Strudel Pattern Templates for LTW Audio Splitter
 Pre-defined beat patterns and templates for different musical styles
 """
-from typing import Dict, List, Any
+from bisect import bisect_right
+from types import MappingProxyType
+from typing import Dict, List, Any, Mapping
 import random
+import threading
+
+
+# analyze_and_suggest_template lookups: tempo < 80 -> ambient, < 100 -> jazz, ...
+_TEMPO_BOUNDS = (80, 100, 120, 140, 160)
+_STYLE_FOR_TEMPO = ("ambient", "jazz", "hip_hop", "rock", "electronic", "electronic")
+
+# Drum hit count < 10 -> minimal, < 20 -> basic, otherwise complex
+_HIT_COUNT_BOUNDS = (10, 20)
+_COMPLEXITY_FOR_HITS = ("minimal", "basic", "complex")
+
+# (style, complexity) -> template pattern; anything else uses "basic"
+_PATTERN_FOR_STYLE = {
+    ("hip_hop", "minimal"): "basic",
+    ("hip_hop", "basic"): "boom_bap",
+    ("hip_hop", "complex"): "trap",
+    ("electronic", "minimal"): "ambient_techno",
+    ("electronic", "basic"): "house",
+    ("electronic", "complex"): "techno",
+}
+
+# Per-thread generators for get_random_template (each Streamlit session runs on its own thread)
+_THREAD_LOCAL = threading.local()
+
+
+def _thread_rng() -> random.Random:
+    rng = getattr(_THREAD_LOCAL, "rng", None)
+    if rng is None:
+        rng = _THREAD_LOCAL.rng = random.Random()
+    return rng
+
 
 class StrudelTemplates:
     """Collection of Strudel pattern templates for different musical styles"""
     
+    # Style -> builder method; a style's templates are only built when first requested
+    _BUILDERS = {
+        "hip_hop": "_get_hip_hop_templates",
+        "electronic": "_get_electronic_templates",
+        "rock": "_get_rock_templates",
+        "jazz": "_get_jazz_templates",
+        "ambient": "_get_ambient_templates",
+        "reggae": "_get_reggae_templates",
+        "funk": "_get_funk_templates",
+        "minimal": "_get_minimal_templates",
+        "tiktok_viral": "_get_tiktok_viral_templates",
+    }
+    
     def __init__(self):
-        self.templates = {
-            "hip_hop": self._get_hip_hop_templates(),
-            "electronic": self._get_electronic_templates(),
-            "rock": self._get_rock_templates(),
-            "jazz": self._get_jazz_templates(),
-            "ambient": self._get_ambient_templates(),
-            "reggae": self._get_reggae_templates(),
-            "funk": self._get_funk_templates(),
-            "minimal": self._get_minimal_templates(),
-            "tiktok_viral": self._get_tiktok_viral_templates()
-        }
+        self._cache: Dict[str, Mapping[str, str]] = {}
+    
+    def _style_templates(self, style: str) -> Mapping[str, str]:
+        """Templates for one known style, built on first use (read-only, safe to share)"""
+        templates = self._cache.get(style)
+        if templates is None:
+            templates = MappingProxyType(getattr(self, self._BUILDERS[style])())
+            self._cache[style] = templates
+        return templates
+    
+    @property
+    def templates(self) -> Dict[str, Mapping[str, str]]:
+        """All styles' templates (builds every style; prefer the per-style getters)"""
+        return {style: self._style_templates(style) for style in self._BUILDERS}
     
     def _get_tiktok_viral_templates(self) -> Dict[str, str]:
         """Viral styles for TikToks/Edits"""
@@ -391,61 +440,61 @@ d3 $ "hh*2"
     
     def get_template(self, style: str, pattern: str = "basic") -> str:
         """Get a specific template"""
-        if style in self.templates and pattern in self.templates[style]:
-            return self.templates[style][pattern]
-        return self.templates["hip_hop"]["basic"]  # Default fallback
+        if style in self._BUILDERS:
+            templates = self._style_templates(style)
+            if pattern in templates:
+                return templates[pattern]
+        return self._style_templates("hip_hop")["basic"]  # Default fallback
     
     def get_random_template(self, style: str = None) -> str:
         """Get a random template from a style or all styles"""
-        if style and style in self.templates:
-            patterns = list(self.templates[style].keys())
-            pattern = random.choice(patterns)
-            return self.templates[style][pattern]
+        rng = _thread_rng()
+        if style and style in self._BUILDERS:
+            templates = self._style_templates(style)
+            pattern = rng.choice(list(templates.keys()))
+            return templates[pattern]
         else:
             # Random from all styles
-            all_styles = list(self.templates.keys())
-            random_style = random.choice(all_styles)
-            patterns = list(self.templates[random_style].keys())
-            random_pattern = random.choice(patterns)
-            return self.templates[random_style][random_pattern]
+            random_style = rng.choice(list(self._BUILDERS.keys()))
+            templates = self._style_templates(random_style)
+            random_pattern = rng.choice(list(templates.keys()))
+            return templates[random_pattern]
     
     def get_all_styles(self) -> List[str]:
         """Get list of all available styles"""
-        return list(self.templates.keys())
+        return list(self._BUILDERS.keys())
     
     def get_patterns_for_style(self, style: str) -> List[str]:
         """Get list of patterns for a specific style"""
-        if style in self.templates:
-            return list(self.templates[style].keys())
+        if style in self._BUILDERS:
+            return list(self._style_templates(style).keys())
         return []
     
     def create_custom_template(self, drums: str, melody: str = None, chords: str = None, tempo: int = 120) -> str:
         """Create a custom template from user input"""
-        template = f"""
-// Custom Template - Tempo: {tempo} BPM
-setcpm ({tempo * 4})
-
-d1 $ "{drums}"
-"""
+        lines = [
+            f"// Custom Template - Tempo: {tempo} BPM",
+            f"setcpm ({tempo * 4})",
+            "",
+            f'd1 $ "{drums}"',
+        ]
         
         if melody:
-            template += f'd2 $ n "{melody}" # s "piano"\n'
+            lines.append(f'd2 $ n "{melody}" # s "piano"')
         
         if chords:
-            template += f'd3 $ chord "{chords}" # s "pad"\n'
+            lines.append(f'd3 $ chord "{chords}" # s "pad"')
         
-        template += """
-hush
-d1
-"""
+        lines += ["", "hush", "d1"]
         
         if melody:
-            template += "d2\n"
+            lines.append("d2")
         
         if chords:
-            template += "d3\n"
+            lines.append("d3")
         
-        return template.strip()
+        # Joined without leading/trailing blank lines, so no final strip() is needed
+        return "\n".join(lines)
     
     def analyze_and_suggest_template(self, analysis_data: Dict[str, Any]) -> str:
         """Analyze audio data and suggest appropriate template"""
@@ -454,50 +503,22 @@ d1
         melody = analysis_data.get('melody', {})
         chords = analysis_data.get('chords', {})
         
-        # Analyze tempo to suggest style
-        if tempo < 80:
-            suggested_style = "ambient"
-        elif tempo < 100:
-            suggested_style = "jazz"
-        elif tempo < 120:
-            suggested_style = "hip_hop"
-        elif tempo < 140:
-            suggested_style = "rock"
-        elif tempo < 160:
-            suggested_style = "electronic"
-        else:
-            suggested_style = "electronic"
+        # Analyze tempo to suggest style (upper bounds are exclusive, hence bisect_right)
+        suggested_style = _STYLE_FOR_TEMPO[bisect_right(_TEMPO_BOUNDS, tempo)]
         
         # Get drum complexity
         drum_hits = drums.get('drum_hits', [])
-        if len(drum_hits) < 10:
-            complexity = "minimal"
-        elif len(drum_hits) < 20:
-            complexity = "basic"
-        else:
-            complexity = "complex"
+        complexity = _COMPLEXITY_FOR_HITS[bisect_right(_HIT_COUNT_BOUNDS, len(drum_hits))]
         
         # Choose appropriate pattern
-        if suggested_style == "hip_hop":
-            if complexity == "minimal":
-                pattern = "basic"
-            elif complexity == "basic":
-                pattern = "boom_bap"
-            else:
-                pattern = "trap"
-        elif suggested_style == "electronic":
-            if complexity == "minimal":
-                pattern = "ambient_techno"
-            elif complexity == "basic":
-                pattern = "house"
-            else:
-                pattern = "techno"
-        else:
-            pattern = "basic"
+        pattern = _PATTERN_FOR_STYLE.get((suggested_style, complexity), "basic")
         
         return self.get_template(suggested_style, pattern)
 
 
+_TEMPLATES = StrudelTemplates()
+
+
 def get_strudel_templates() -> StrudelTemplates:
-    """Get the Strudel templates instance"""
-    return StrudelTemplates()
+    """Get the shared Strudel templates instance"""
+    return _TEMPLATES
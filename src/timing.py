@@ -2,41 +2,198 @@
 Timing analysis utilities for Beat & Stems Lab
 Handles BPM detection, beat tracking, and downbeat detection
 """
+import hashlib
+import itertools
+import threading
+from collections import Counter, OrderedDict
+
 import numpy as np
 import librosa
 from typing import Dict, List, Optional, Tuple
 from scipy.signal import find_peaks
 
-from config import SAMPLE_RATE, HOP_LENGTH
+from config import SAMPLE_RATE, N_FFT, HOP_LENGTH
+
+# Bump whenever create_beat_grid's output changes, so saved beat grids from an
+# older version are recomputed instead of reused
+ANALYSIS_VERSION = 1
+
+# Recent _compute_features results keyed by audio content; the UI re-runs analyses
+# on the same track, and the STFT + beat tracking behind them takes seconds
+_FEATURE_CACHE_SIZE = 16
+_feature_cache: "OrderedDict[tuple, Dict[str, any]]" = OrderedDict()
+_feature_cache_lock = threading.Lock()
 
 
-def analyze_tempo_and_beats(audio: np.ndarray, sr: int = SAMPLE_RATE) -> Dict[str, any]:
+def _compute_features(audio: np.ndarray, sr: int = SAMPLE_RATE) -> Dict[str, any]:
+    """
+    Compute the onset features shared by the timing analyses
+    
+    One log-mel spectrogram feeds both onset envelopes: the mean-aggregated one
+    used for onset detection/strength, and the median-aggregated one that
+    librosa's beat_track builds internally.
+    
+    Args:
+        audio: Audio data
+        sr: Sample rate
+        
+    Returns:
+        Dictionary with onset_env, beat_onset_env, tempo (BPM) and beat_frames
+        (cached per audio content; treat the arrays as read-only)
+    """
+    # STFT/onset work is bandwidth-bound; float32 halves the bytes moved
+    if audio.dtype != np.float32:
+        audio = audio.astype(np.float32, copy=False)
+    
+    key = _audio_cache_key(audio, sr)
+    with _feature_cache_lock:
+        features = _feature_cache.get(key)
+        if features is not None:
+            _feature_cache.move_to_end(key)
+            return features
+    
+    mel = librosa.feature.melspectrogram(y=audio, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH)
+    features = _features_from_mel(mel, sr)
+    
+    with _feature_cache_lock:
+        _feature_cache[key] = features
+        while len(_feature_cache) > _FEATURE_CACHE_SIZE:
+            _feature_cache.popitem(last=False)
+    return features
+
+
+def _audio_cache_key(audio: np.ndarray, sr: int) -> tuple:
+    """Content hash of the samples plus shape, dtype and sample rate"""
+    data = np.ascontiguousarray(audio)
+    digest = hashlib.blake2b(memoryview(data).cast("B"), digest_size=16).digest()
+    return digest, data.shape, data.dtype.str, sr
+
+
+def _features_from_mel(mel: np.ndarray, sr: int) -> Dict[str, any]:
+    """
+    Onset envelopes and beat tracking from a mel power spectrogram
+    
+    Args:
+        mel: Mel power spectrogram (n_mels x frames) at HOP_LENGTH
+        sr: Sample rate
+        
+    Returns:
+        Dictionary with onset_env, beat_onset_env, tempo (BPM) and beat_frames
+    """
+    log_mel = librosa.power_to_db(np.abs(mel))
+    
+    onset_env = librosa.onset.onset_strength(
+        S=log_mel, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH
+    )
+    beat_onset_env = librosa.onset.onset_strength(
+        S=log_mel, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH, aggregate=np.median
+    )
+    
+    tempo, beat_frames = librosa.beat.beat_track(
+        onset_envelope=beat_onset_env,
+        sr=sr,
+        hop_length=HOP_LENGTH
+    )
+    # librosa >= 0.10 returns tempo as a 1-element array
+    if isinstance(tempo, np.ndarray):
+        tempo = float(tempo.item())
+    else:
+        tempo = float(tempo)
+    
+    return {
+        "onset_env": onset_env,
+        "beat_onset_env": beat_onset_env,
+        "tempo": tempo,
+        "beat_frames": beat_frames
+    }
+
+
+def analyze_tempo_and_beats(audio: np.ndarray, sr: int = SAMPLE_RATE,
+                            features: Optional[Dict[str, any]] = None,
+                            as_json: bool = False) -> Dict[str, any]:
     """
     Analyze tempo and beat timing
     
     Args:
         audio: Audio data
         sr: Sample rate
+        features: Precomputed result of _compute_features for this audio
+        as_json: Return beat_times/beat_confidence as lists instead of ndarrays
         
     Returns:
         Dictionary containing tempo, beat times, and confidence
     """
-    # Use librosa's tempo and beat tracking
-    tempo, beat_frames = librosa.beat.beat_track(
-        y=audio, 
-        sr=sr, 
-        hop_length=HOP_LENGTH,
-        units='time'
+    if features is None:
+        features = _compute_features(audio, sr)
+    
+    return _summarize_beats(features, sr, len(audio) / sr, as_json)
+
+
+def analyze_tempo_and_beats_stream(path: str, block_length: int = 256,
+                                   as_json: bool = False) -> Dict[str, any]:
+    """
+    Analyze tempo and beat timing of an audio file without loading it whole
+    
+    The file is read in blocks of block_length hops with librosa.stream, so
+    peak memory is one block plus the (small) mel spectrogram. Analysis runs at
+    the file's native sample rate; librosa.stream cannot resample.
+    
+    Args:
+        path: Path to an audio file readable by soundfile
+        block_length: Hops (of HOP_LENGTH samples) per streamed block
+        as_json: Return beat_times/beat_confidence as lists instead of ndarrays
+        
+    Returns:
+        Same dictionary as analyze_tempo_and_beats on the same samples
+    """
+    sr = librosa.get_samplerate(path)
+    stream = librosa.stream(
+        path,
+        block_length=block_length,
+        frame_length=HOP_LENGTH,
+        hop_length=HOP_LENGTH
     )
     
-    # Convert beat frames to times
+    # Frame the zero-padded signal exactly like the centered STFT of the
+    # in-memory path: N_FFT // 2 zeros on each side, frames every HOP_LENGTH.
+    # Samples not yet covered by a whole frame carry over to the next block.
+    pad = np.zeros(N_FFT // 2, dtype=np.float32)
+    pending = pad
+    mel_blocks = []
+    n_samples = 0
+    for block in itertools.chain(stream, [None]):
+        if block is None:
+            pending = np.concatenate([pending, pad])
+        else:
+            n_samples += len(block)
+            pending = np.concatenate([pending, block])
+        if len(pending) < N_FFT:
+            continue
+        n_frames = 1 + (len(pending) - N_FFT) // HOP_LENGTH
+        mel_blocks.append(librosa.feature.melspectrogram(
+            y=pending[:(n_frames - 1) * HOP_LENGTH + N_FFT], sr=sr,
+            n_fft=N_FFT, hop_length=HOP_LENGTH, center=False
+        ))
+        pending = pending[n_frames * HOP_LENGTH:]
+    if n_samples == 0:
+        raise ValueError(f"No audio frames could be read from {path}")
+    
+    features = _features_from_mel(np.hstack(mel_blocks), sr)
+    return _summarize_beats(features, sr, n_samples / sr, as_json)
+
+
+def _summarize_beats(features: Dict[str, any], sr: int, duration: float,
+                     as_json: bool = False) -> Dict[str, any]:
+    """Tempo/beat result dictionary from _compute_features output"""
+    # Use librosa's tempo and beat tracking
+    tempo = features["tempo"]
+    
+    # Beat frames index the onset envelope directly; convert to times once
+    beat_frames = features["beat_frames"]
     beat_times = librosa.frames_to_time(beat_frames, sr=sr, hop_length=HOP_LENGTH)
     
     # Calculate beat confidence using onset strength
-    onset_env = librosa.onset.onset_strength(y=audio, sr=sr, hop_length=HOP_LENGTH)
-    
-    # Convert beat times to frames for onset strength calculation
-    beat_frames = librosa.time_to_frames(beat_times, sr=sr, hop_length=HOP_LENGTH)
+    onset_env = features["onset_env"]
     beat_strength = onset_env[beat_frames] if len(beat_frames) > 0 else np.array([])
     
     # Normalize beat strength
@@ -47,11 +204,11 @@ def analyze_tempo_and_beats(audio: np.ndarray, sr: int = SAMPLE_RATE) -> Dict[st
     
     return {
         "bpm": float(tempo),
-        "beat_times": beat_times.tolist(),
-        "beat_confidence": beat_confidence.tolist(),
+        "beat_times": beat_times.tolist() if as_json else beat_times,
+        "beat_confidence": beat_confidence.tolist() if as_json else beat_confidence,
         "downbeat_times": downbeat_times,
         "total_beats": len(beat_times),
-        "duration": len(audio) / sr
+        "duration": duration
     }
 
 
@@ -77,18 +234,21 @@ def detect_downbeats(beat_times: np.ndarray, tempo: float, sr: int) -> List[floa
     measures_per_beat = 4
     measure_duration = beat_interval * measures_per_beat
     
+    # Allow some tolerance (within 10% of beat interval)
+    tolerance = beat_interval * 0.1
+    
+    # Each measure start depends on the previous one, so this stays a loop; iterate
+    # over Python floats rather than NumPy scalars to keep the per-beat cost low
     downbeats = []
-    current_measure_start = beat_times[0]
+    beat_list = np.asarray(beat_times, dtype=np.float64).tolist()
+    current_measure_start = beat_list[0]
     
-    for beat_time in beat_times:
+    for beat_time in beat_list:
         # Check if this beat is close to a measure boundary
         time_since_measure = (beat_time - current_measure_start) % measure_duration
         
-        # Allow some tolerance (within 10% of beat interval)
-        tolerance = beat_interval * 0.1
-        
         if time_since_measure < tolerance or (measure_duration - time_since_measure) < tolerance:
-            downbeats.append(float(beat_time))
+            downbeats.append(beat_time)
             current_measure_start = beat_time
     
     return downbeats
@@ -106,66 +266,84 @@ def refine_beat_grid(beat_times: List[float], tempo: float, duration: float) ->
     Returns:
         Refined beat times
     """
-    if not beat_times:
-        return []
+    refined_beats, _ = _refine_beat_grid_np(beat_times, tempo, duration)
+    return refined_beats.tolist()
+
+
+def _refine_beat_grid_np(beat_times: np.ndarray, tempo: float,
+                         duration: float) -> Tuple[np.ndarray, int]:
+    """refine_beat_grid returning an ndarray and its beat count"""
+    if len(beat_times) == 0:
+        return np.empty(0), 0
     
     beat_interval = 60.0 / tempo
     
     # Start from the first detected beat
-    start_time = beat_times[0]
-    
-    # Generate regular grid
-    refined_beats = []
-    current_time = start_time
+    start_time = float(beat_times[0])
+    if start_time > duration:
+        return np.empty(0), 0
     
-    while current_time <= duration:
-        refined_beats.append(current_time)
-        current_time += beat_interval
+    # Generate regular grid in one allocation (one spare step, trimmed by the mask)
+    n_beats = int((duration - start_time) / beat_interval) + 2
+    refined_beats = start_time + np.arange(n_beats) * beat_interval
     
-    return refined_beats
+    refined_beats = refined_beats[refined_beats <= duration]
+    return refined_beats, int(refined_beats.size)
 
 
-def analyze_rhythm_complexity(audio: np.ndarray, sr: int = SAMPLE_RATE) -> Dict[str, any]:
+def analyze_rhythm_complexity(audio: np.ndarray, sr: int = SAMPLE_RATE,
+                              features: Optional[Dict[str, any]] = None,
+                              as_json: bool = False) -> Dict[str, any]:
     """
     Analyze rhythm complexity and patterns
     
     Args:
         audio: Audio data
         sr: Sample rate
+        features: Precomputed result of _compute_features for this audio
+        as_json: Return onset_times as a list instead of an ndarray
         
     Returns:
         Dictionary with rhythm analysis results
     """
+    if features is None:
+        features = _compute_features(audio, sr)
+    
     # Calculate onset strength
-    onset_env = librosa.onset.onset_strength(y=audio, sr=sr, hop_length=HOP_LENGTH)
+    onset_env = features["onset_env"]
     
     # Find onset peaks
     onset_frames = librosa.onset.onset_detect(
         onset_envelope=onset_env,
         sr=sr,
         hop_length=HOP_LENGTH,
-        units='time'
+        units='frames'
     )
+    onset_times = librosa.frames_to_time(onset_frames, sr=sr, hop_length=HOP_LENGTH)
     
     # Calculate rhythm features
-    tempo, _ = librosa.beat.beat_track(y=audio, sr=sr, hop_length=HOP_LENGTH)
+    tempo = features["tempo"]
+    
+    # Inter-onset intervals in seconds, shared by regularity and the average
+    onset_intervals = np.diff(onset_frames) * (HOP_LENGTH / sr)
     
     # Calculate rhythm regularity
-    if len(onset_frames) > 1:
-        onset_intervals = np.diff(onset_frames)
+    if onset_intervals.size:
         rhythm_regularity = 1.0 / (1.0 + np.std(onset_intervals))
+        avg_onset_interval = float(np.mean(onset_intervals))
     else:
         rhythm_regularity = 0.0
+        avg_onset_interval = 0.0
     
     # Calculate syncopation (simplified)
-    syncopation = calculate_syncopation(onset_frames, tempo, sr)
+    syncopation = calculate_syncopation(onset_times, tempo, sr)
     
     return {
-        "onset_times": onset_frames.tolist(),
+        "onset_times": onset_times.tolist() if as_json else onset_times,
         "rhythm_regularity": float(rhythm_regularity),
         "syncopation": float(syncopation),
         "onset_count": len(onset_frames),
-        "avg_onset_interval": float(np.mean(np.diff(onset_frames))) if len(onset_frames) > 1 else 0.0
+        "avg_onset_interval": avg_onset_interval
     }
 
 
@@ -186,16 +364,11 @@ def calculate_syncopation(onset_times: np.ndarray, tempo: float, sr: int) -> flo
     
     beat_interval = 60.0 / tempo
     
-    # Count onsets that don't align with strong beats
-    syncopated_count = 0
+    # Position of every onset within its beat (0-1)
+    beat_position = np.mod(np.asarray(onset_times, dtype=np.float64), beat_interval) / beat_interval
     
-    for onset_time in onset_times:
-        # Find nearest beat
-        beat_position = (onset_time % beat_interval) / beat_interval
-        
-        # Consider off-beat positions as syncopated
-        if 0.25 < beat_position < 0.75:
-            syncopated_count += 1
+    # Count onsets that don't align with strong beats (off-beat positions are syncopated)
+    syncopated_count = np.count_nonzero((beat_position > 0.25) & (beat_position < 0.75))
     
     return syncopated_count / len(onset_times)
 
@@ -223,32 +396,18 @@ def detect_time_signature(beat_times: List[float], tempo: float) -> Dict[str, an
     # This is a simplified approach - in practice, more sophisticated analysis would be needed
     
     # Count beats per measure by looking for longer intervals
-    measure_boundaries = []
-    for i, diff in enumerate(beat_differences):
-        if diff > beat_interval * 1.5:  # Gap longer than 1.5 beats
-            measure_boundaries.append(i + 1)
-    
-    if measure_boundaries:
-        # Calculate beats per measure
-        beats_per_measure = []
-        prev_boundary = 0
-        for boundary in measure_boundaries:
-            beats_in_measure = boundary - prev_boundary
-            beats_per_measure.append(beats_in_measure)
-            prev_boundary = boundary
-        
-        # Add last measure
-        beats_in_last_measure = len(beat_times) - prev_boundary
-        if beats_in_last_measure > 0:
-            beats_per_measure.append(beats_in_last_measure)
+    measure_boundaries = np.flatnonzero(beat_differences > beat_interval * 1.5) + 1  # Gap longer than 1.5 beats
+    
+    if len(measure_boundaries):
+        # Calculate beats per measure (the last measure always has at least one beat)
+        beats_per_measure = np.diff(
+            np.concatenate(([0], measure_boundaries, [len(beat_times)]))
+        ).tolist()
         
-        # Most common beats per measure
-        if beats_per_measure:
-            numerator = max(set(beats_per_measure), key=beats_per_measure.count)
-            confidence = beats_per_measure.count(numerator) / len(beats_per_measure)
-        else:
-            numerator = 4
-            confidence = 0.5
+        # Most common beats per measure; counted once instead of list.count per candidate
+        counts = Counter(beats_per_measure)
+        numerator = max(set(beats_per_measure), key=counts.__getitem__)
+        confidence = counts[numerator] / len(beats_per_measure)
     else:
         # Default to 4/4 if no clear pattern
         numerator = 4
@@ -272,54 +431,68 @@ def create_beat_grid(audio: np.ndarray, sr: int = SAMPLE_RATE) -> Dict[str, any]
     Returns:
         Complete beat grid analysis
     """
-    # Get basic tempo and beats
-    tempo_analysis = analyze_tempo_and_beats(audio, sr)
+    # Onset envelopes and beat tracking are shared by every analysis below
+    features = _compute_features(audio, sr)
+    
+    # Get basic tempo and beats (kept as ndarrays until the result dict below)
+    tempo_analysis = analyze_tempo_and_beats(audio, sr, features=features)
     
     # Refine beat grid
-    refined_beats = refine_beat_grid(
+    refined_beats, total_beats = _refine_beat_grid_np(
         tempo_analysis["beat_times"],
         tempo_analysis["bpm"],
         tempo_analysis["duration"]
     )
     
     # Analyze rhythm complexity
-    rhythm_analysis = analyze_rhythm_complexity(audio, sr)
+    rhythm_analysis = analyze_rhythm_complexity(audio, sr, features=features)
     
     # Detect time signature
     time_signature = detect_time_signature(tempo_analysis["beat_times"], tempo_analysis["bpm"])
     
     return {
         "tempo": tempo_analysis["bpm"],
-        "beat_times": refined_beats,
+        "beat_times": refined_beats.tolist(),
         "downbeat_times": tempo_analysis["downbeat_times"],
         "time_signature": time_signature,
         "rhythm_complexity": rhythm_analysis["rhythm_regularity"],
         "syncopation": rhythm_analysis["syncopation"],
         "duration": tempo_analysis["duration"],
-        "total_beats": len(refined_beats)
+        "total_beats": total_beats
     }
 
 
-def validate_tempo_estimation(audio: np.ndarray, sr: int = SAMPLE_RATE) -> Dict[str, any]:
+def validate_tempo_estimation(audio: np.ndarray, sr: int = SAMPLE_RATE,
+                              features: Optional[Dict[str, any]] = None) -> Dict[str, any]:
     """
     Validate tempo estimation with multiple methods
     
     Args:
         audio: Audio data
         sr: Sample rate
+        features: Precomputed result of _compute_features for this audio
         
     Returns:
         Validation results
     """
-    # Method 1: librosa beat_track
-    tempo1, _ = librosa.beat.beat_track(y=audio, sr=sr, hop_length=HOP_LENGTH)
-    
-    # Method 2: librosa tempo
-    tempo2 = librosa.beat.tempo(y=audio, sr=sr, hop_length=HOP_LENGTH)[0]
+    if features is None:
+        features = _compute_features(audio, sr)
     
-    # Method 3: onset-based tempo
-    onset_env = librosa.onset.onset_strength(y=audio, sr=sr, hop_length=HOP_LENGTH)
-    tempo3 = librosa.beat.tempo(onset_envelope=onset_env, sr=sr, hop_length=HOP_LENGTH)[0]
+    # Method 1: librosa beat_track
+    tempo1 = features["tempo"]
+    
+    # Method 2: onset-based tempo (librosa tempo on the mean onset envelope)
+    tempo2 = float(librosa.feature.tempo(
+        onset_envelope=features["onset_env"], sr=sr, hop_length=HOP_LENGTH
+    )[0])
+    
+    # Method 3: median of the local (per-window) tempo curve; beat_track's own
+    # beat spacing would just reproduce method 1
+    local_tempo = librosa.feature.tempo(
+        onset_envelope=features["beat_onset_env"], sr=sr, hop_length=HOP_LENGTH,
+        aggregate=None
+    )
+    tempo3 = float(np.median(local_tempo))
     
     tempos = [tempo1, tempo2, tempo3]
     
@@ -3,18 +3,116 @@ Visualization utilities for Beat & Stems Lab
 Handles waveform and spectrogram plotting
 """
 import numpy as np
-import matplotlib.pyplot as plt
 import plotly.graph_objects as go
-import plotly.express as px
 from plotly.subplots import make_subplots
 import librosa
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from config import (
     N_FFT, HOP_LENGTH, WAVEFORM_HEIGHT, SPECTROGRAM_HEIGHT,
     SAMPLE_RATE
 )
 
+# Upper bound on plotted waveform points; the browser can't show more detail than this
+MAX_WAVEFORM_POINTS = 8000
+
+# Upper bound on plotted pitch-track frames in create_melody_visualization
+MAX_PITCH_POINTS = 4000
+
+# Upper bound on spectrogram heatmap columns (time frames) sent to the browser
+MAX_SPECTROGRAM_COLUMNS = 2000
+
+
+def _envelope_downsample(
+    audio: np.ndarray,
+    sr: int,
+    max_points: int = MAX_WAVEFORM_POINTS,
+    time_axes: Optional[Dict[int, np.ndarray]] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reduce a waveform to at most max_points while keeping its peak envelope
+    
+    Samples are grouped into equal buckets and each bucket contributes its
+    minimum and maximum, so transients survive the reduction.
+    
+    Args:
+        audio: Audio data
+        sr: Sample rate
+        max_points: Maximum number of points to return
+        time_axes: Optional {len(audio): time axis} cache shared between calls
+            with the same sr and max_points (e.g. equal-length stems)
+        
+    Returns:
+        Tuple of (time axis in seconds, values to plot)
+    """
+    duration = len(audio) / sr
+    if len(audio) <= max_points:
+        return _time_axis(duration, len(audio), len(audio), time_axes), audio
+    
+    stride = -(-len(audio) // (max_points // 2))  # ceil division
+    n_full = len(audio) // stride
+    buckets = audio[:n_full * stride].reshape(n_full, stride)
+    mins = buckets.min(axis=1)
+    maxs = buckets.max(axis=1)
+    
+    tail = audio[n_full * stride:]
+    if len(tail):
+        mins = np.append(mins, tail.min())
+        maxs = np.append(maxs, tail.max())
+    
+    envelope = np.empty(2 * len(mins), dtype=audio.dtype)
+    envelope[0::2] = mins
+    envelope[1::2] = maxs
+    
+    return _time_axis(duration, len(envelope), len(audio), time_axes), envelope
+
+
+def _max_pool_columns(S: np.ndarray, factor: int) -> np.ndarray:
+    """Max over each run of `factor` columns; a shorter last run is kept"""
+    n_bins, n_frames = S.shape
+    n_full = n_frames // factor
+    pooled = S[:, :n_full * factor].reshape(n_bins, n_full, factor).max(axis=2)
+    if n_frames % factor:
+        pooled = np.hstack([pooled, S[:, n_full * factor:].max(axis=1, keepdims=True)])
+    return pooled
+
+
+def _row_axis_titles(y_titles: List[str]) -> Dict[str, str]:
+    """
+    update_layout kwargs titling the axes of stacked single-column subplots
+    
+    Row 1 uses xaxis/yaxis, row n uses xaxis{n}/yaxis{n}; every x axis is time.
+    """
+    layout = {}
+    for row, y_title in enumerate(y_titles, start=1):
+        suffix = "" if row == 1 else str(row)
+        layout[f"xaxis{suffix}_title_text"] = "Time (seconds)"
+        layout[f"yaxis{suffix}_title_text"] = y_title
+    return layout
+
+
+def _vertical_lines(xs: np.ndarray, y0: float, y1: float) -> Tuple[np.ndarray, np.ndarray]:
+    """x/y arrays drawing a vertical segment at each x, NaN-separated for one Scatter trace"""
+    line_x = np.repeat(np.asarray(xs, dtype=np.float64), 3)
+    line_x[2::3] = np.nan
+    line_y = np.tile([y0, y1, np.nan], len(xs))
+    return line_x, line_y
+
+
+def _time_axis(
+    duration: float,
+    n_points: int,
+    key: int,
+    time_axes: Optional[Dict[int, np.ndarray]]
+) -> np.ndarray:
+    """np.linspace(0, duration, n_points), reused from time_axes[key] when cached"""
+    if time_axes is None:
+        return np.linspace(0, duration, n_points)
+    time = time_axes.get(key)
+    if time is None:
+        time = time_axes[key] = np.linspace(0, duration, n_points)
+    return time
+
 
 def create_waveform_plot(audio: np.ndarray, sr: int, title: str = "Waveform") -> go.Figure:
     """
@@ -28,12 +126,12 @@ def create_waveform_plot(audio: np.ndarray, sr: int, title: str = "Waveform") ->
     Returns:
         Plotly figure object
     """
-    time = np.linspace(0, len(audio) / sr, len(audio))
+    time, plot_y = _envelope_downsample(audio, sr)
     
     fig = go.Figure()
     fig.add_trace(go.Scatter(
         x=time,
-        y=audio,
+        y=plot_y,
         mode='lines',
         name='Waveform',
         line=dict(color='#1f77b4', width=1),
@@ -64,14 +162,24 @@ def create_spectrogram_plot(audio: np.ndarray, sr: int, title: str = "Spectrogra
     Returns:
         Plotly figure object
     """
-    # Compute spectrogram
-    D = librosa.stft(audio, n_fft=N_FFT, hop_length=HOP_LENGTH)
-    S_db = librosa.amplitude_to_db(np.abs(D), ref=np.max)
+    # Compute spectrogram in single precision (complex64 STFT -> float32 magnitude)
+    D = librosa.stft(np.asarray(audio, dtype=np.float32), n_fft=N_FFT, hop_length=HOP_LENGTH)
+    S = np.abs(D)
+    del D
     
     # Time and frequency axes
-    times = librosa.times_like(S_db, sr=sr, hop_length=HOP_LENGTH)
+    times = librosa.times_like(S, sr=sr, hop_length=HOP_LENGTH)
     freqs = librosa.fft_frequencies(sr=sr, n_fft=N_FFT)
     
+    # Max-pool frames down to what the heatmap can display (dB is monotonic, so
+    # pooling before the conversion gives the same picture on less data)
+    if S.shape[1] > MAX_SPECTROGRAM_COLUMNS:
+        factor = -(-S.shape[1] // MAX_SPECTROGRAM_COLUMNS)  # ceil division
+        S = _max_pool_columns(S, factor)
+        times = times[::factor]
+    
+    S_db = librosa.amplitude_to_db(S, ref=np.max)
+    
     fig = go.Figure()
     fig.add_trace(go.Heatmap(
         z=S_db,
@@ -111,36 +219,53 @@ def create_waveform_with_beats(
     Returns:
         Plotly figure object
     """
-    time = np.linspace(0, len(audio) / sr, len(audio))
+    duration = len(audio) / sr
+    time, plot_y = _envelope_downsample(audio, sr)
     
     fig = go.Figure()
     
     # Main waveform
     fig.add_trace(go.Scatter(
         x=time,
-        y=audio,
+        y=plot_y,
         mode='lines',
         name='Waveform',
         line=dict(color='#1f77b4', width=1),
         hovertemplate='Time: %{x:.2f}s<br>Amplitude: %{y:.3f}<extra></extra>'
     ))
     
-    # Beat grid overlay
-    if beat_times:
-        for i, beat_time in enumerate(beat_times):
-            if 0 <= beat_time <= time[-1]:
-                # Alternate colors for visual distinction
-                color = '#ff7f0e' if i % 4 == 0 else '#2ca02c'
-                line_width = 2 if i % 4 == 0 else 1
-                
-                fig.add_vline(
-                    x=beat_time,
-                    line_dash="dash",
-                    line_color=color,
-                    line_width=line_width,
-                    annotation_text=f"Beat {i+1}" if i % 4 == 0 else "",
-                    annotation_position="top right"
-                )
+    # Beat grid overlay: one trace per line style instead of a shape per beat
+    if beat_times is not None and len(beat_times) > 0:
+        beats = np.asarray(beat_times, dtype=np.float64)
+        in_range = (beats >= 0) & (beats <= duration)
+        # Every 4th beat (by position in the full list) is accented and labelled
+        accented = np.arange(len(beats)) % 4 == 0
+        y0, y1 = (float(plot_y.min()), float(plot_y.max())) if len(plot_y) else (-1.0, 1.0)
+        
+        for mask, color, line_width in (
+            (in_range & ~accented, '#2ca02c', 1),
+            (in_range & accented, '#ff7f0e', 2),
+        ):
+            if not mask.any():
+                continue
+            line_x, line_y = _vertical_lines(beats[mask], y0, y1)
+            fig.add_trace(go.Scatter(
+                x=line_x,
+                y=line_y,
+                mode='lines',
+                line=dict(color=color, width=line_width, dash='dash'),
+                hoverinfo='skip',
+                showlegend=False
+            ))
+        
+        fig.update_layout(annotations=[
+            dict(
+                x=float(beats[i]), y=1, xref='x', yref='paper',
+                text=f"Beat {i+1}", showarrow=False,
+                xanchor='left', yanchor='top'
+            )
+            for i in np.flatnonzero(in_range & accented)
+        ])
     
     fig.update_layout(
         title=title,
@@ -180,16 +305,11 @@ def create_multi_stem_comparison(
     colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd']
     
     max_points = 4000
+    # Stems are normally all the same length, so they can share one time axis
+    time_axes: Dict[int, np.ndarray] = {}
 
     for i, (stem_name, audio) in enumerate(stems.items()):
-        duration = len(audio) / sr
-        if len(audio) > max_points:
-            step = max(1, len(audio) // max_points)
-            plot_y = audio[::step]
-            time = np.linspace(0, duration, len(plot_y))
-        else:
-            plot_y = audio
-            time = np.linspace(0, duration, len(plot_y))
+        time, plot_y = _envelope_downsample(audio, sr, max_points, time_axes)
         color = colors[i % len(colors)]
         
         fig.add_trace(
@@ -207,14 +327,10 @@ def create_multi_stem_comparison(
     fig.update_layout(
         title=title,
         height=200 * len(stems),
-        showlegend=False
+        showlegend=False,
+        **_row_axis_titles(["Amplitude"] * len(stems))
     )
     
-    # Update all x-axes
-    for i in range(len(stems)):
-        fig.update_xaxes(title_text="Time (seconds)", row=i+1, col=1)
-        fig.update_yaxes(title_text="Amplitude", row=i+1, col=1)
-    
     return fig
 
 
@@ -247,11 +363,11 @@ def create_melody_visualization(
     )
     
     # Waveform
-    time = np.linspace(0, len(audio) / sr, len(audio))
+    time, plot_y = _envelope_downsample(audio, sr)
     fig.add_trace(
         go.Scatter(
             x=time,
-            y=audio,
+            y=plot_y,
             mode='lines',
             name='Waveform',
             line=dict(color='#1f77b4', width=1),
@@ -261,19 +377,19 @@ def create_melody_visualization(
     )
     
     # Pitch track
-    # Filter by confidence
-    confident_mask = f0_confidence > 0.5
-    confident_times = f0_times[confident_mask]
-    confident_freqs = f0_frequencies[confident_mask]
+    # Blank out low-confidence frames so they render as gaps instead of being
+    # bridged, then thin the track to a displayable number of frames
+    f0_plot = np.where(np.asarray(f0_confidence) > 0.5, f0_frequencies, np.nan)
+    stride = max(1, len(f0_plot) // MAX_PITCH_POINTS)
     
     fig.add_trace(
         go.Scatter(
-            x=confident_times,
-            y=confident_freqs,
-            mode='lines+markers',
+            x=np.asarray(f0_times)[::stride],
+            y=f0_plot[::stride],
+            mode='lines',
+            connectgaps=False,
             name='Pitch Track',
             line=dict(color='#ff7f0e', width=2),
-            marker=dict(size=4),
             showlegend=False
         ),
         row=2, col=1
@@ -282,14 +398,11 @@ def create_melody_visualization(
     fig.update_layout(
         title=title,
         height=600,
-        showlegend=False
+        showlegend=False,
+        yaxis2_type='log',
+        **_row_axis_titles(["Amplitude", "Frequency (Hz)"])
     )
     
-    fig.update_xaxes(title_text="Time (seconds)", row=1, col=1)
-    fig.update_yaxes(title_text="Amplitude", row=1, col=1)
-    fig.update_xaxes(title_text="Time (seconds)", row=2, col=1)
-    fig.update_yaxes(title_text="Frequency (Hz)", row=2, col=1, type='log')
-    
     return fig
 
 
@@ -320,11 +433,11 @@ def create_chord_visualization(
     )
     
     # Waveform
-    time = np.linspace(0, len(audio) / sr, len(audio))
+    time, plot_y = _envelope_downsample(audio, sr)
     fig.add_trace(
         go.Scatter(
             x=time,
-            y=audio,
+            y=plot_y,
             mode='lines',
             name='Waveform',
             line=dict(color='#1f77b4', width=1),
@@ -364,14 +477,11 @@ def create_chord_visualization(
     fig.update_layout(
         title=title,
         height=600,
-        showlegend=False
+        showlegend=False,
+        yaxis2_range=[0, 1],
+        **_row_axis_titles(["Amplitude", "Chords"])
     )
     
-    fig.update_xaxes(title_text="Time (seconds)", row=1, col=1)
-    fig.update_yaxes(title_text="Amplitude", row=1, col=1)
-    fig.update_xaxes(title_text="Time (seconds)", row=2, col=1)
-    fig.update_yaxes(title_text="Chords", row=2, col=1, range=[0, 1])
-    
     return fig
 
 
@@ -402,11 +512,11 @@ def create_drum_visualization(
     )
     
     # Waveform
-    time = np.linspace(0, len(audio) / sr, len(audio))
+    time, plot_y = _envelope_downsample(audio, sr)
     fig.add_trace(
         go.Scatter(
             x=time,
-            y=audio,
+            y=plot_y,
             mode='lines',
             name='Waveform',
             line=dict(color='#1f77b4', width=1),
@@ -418,27 +528,32 @@ def create_drum_visualization(
     # Drum onsets
     colors = {'kick': '#d62728', 'snare': '#ff7f0e', 'hat': '#2ca02c'}
     
+    # One NaN-separated line trace per drum type rather than a shape per onset
+    onsets_by_type: Dict[str, List[float]] = {}
     for onset_time, drum_type in zip(onset_times, drum_types):
-        color = colors.get(drum_type, '#1f77b4')
-        
-        fig.add_vline(
-            x=onset_time,
-            line_color=color,
-            line_width=2,
-            annotation_text=drum_type.upper(),
-            annotation_position="top right",
+        onsets_by_type.setdefault(drum_type, []).append(onset_time)
+    
+    for drum_type, times in onsets_by_type.items():
+        line_x, line_y = _vertical_lines(times, 0, 1)
+        fig.add_trace(
+            go.Scatter(
+                x=line_x,
+                y=line_y,
+                mode='lines',
+                name=drum_type.upper(),
+                line=dict(color=colors.get(drum_type, '#1f77b4'), width=2),
+                hovertemplate=f'{drum_type.upper()}: %{{x:.2f}}s<extra></extra>',
+                showlegend=False
+            ),
             row=2, col=1
         )
     
     fig.update_layout(
         title=title,
         height=600,
-        showlegend=False
+        showlegend=False,
+        yaxis2_range=[0, 1],
+        **_row_axis_titles(["Amplitude", "Drum Onsets"])
     )
     
-    fig.update_xaxes(title_text="Time (seconds)", row=1, col=1)
-    fig.update_yaxes(title_text="Amplitude", row=1, col=1)
-    fig.update_xaxes(title_text="Time (seconds)", row=2, col=1)
-    fig.update_yaxes(title_text="Drum Onsets", row=2, col=1, range=[0, 1])
-    
     return fig
@@ -1,9 +1,5 @@
 #!/usr/bin/env python3
 """Quick end-to-end test for Nice 2 Know Ya using existing stems."""
-import sys
-from pathlib import Path
-
-sys.path.insert(0, str(Path(__file__).parent))
 
 from src.app_helpers import build_analysis_data_for_strudel, load_all_analysis_results
 from src.drums import extract_drums_to_midi
@@ -29,10 +25,13 @@ def main():
     print(f"🎵 Testing LTW Audio with: {PROJECT_NAME}")
     print(f"   Audio: {config.get('audio', {}).get('duration', 0):.1f}s")
 
-    drum_stem = get_stem_path(project, "drums")
-    if drum_stem.exists():
+    try:
+        drum_audio, sr = load_audio_file(get_stem_path(project, "drums"))
+    except FileNotFoundError:
+        drum_audio = None
+
+    if drum_audio is not None:
         print("\n🥁 Re-analyzing drums from separated stem (improved classifier)...")
-        drum_audio, sr = load_audio_file(drum_stem)
         drum_results = extract_drums_to_midi(
             drum_audio,
             sr,
@@ -58,16 +57,13 @@ def main():
     print(f"   Bass notes: {len(analysis_data.get('bass', {}).get('notes', []))}")
 
     print("\n📝 Regenerating Strudel patterns...")
-    files = generate_strudel_from_analysis(
-        analysis_data, str(project.project_path / "strudel")
+    files, code = generate_strudel_from_analysis(
+        analysis_data, str(project.project_path / "strudel"), with_contents=True
     )
-    print("✅ Generated:")
-    for k, v in sorted(files.items()):
-        print(f"   - {k}: {v}")
+    print("✅ Generated:\n" + "\n".join(f"   - {k}: {v}" for k, v in sorted(files.items())))
 
-    arrangement = Path(files.get("arrangement", ""))
-    if arrangement.exists():
-        lines = arrangement.read_text().splitlines()[:12]
+    if code.get("arrangement"):
+        lines = code["arrangement"].splitlines()[:12]
         print("\n--- arrangement.js (preview) ---")
         print("\n".join(lines))
         print("...")
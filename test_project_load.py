@@ -1,10 +1,7 @@
 #!/usr/bin/env python3
 """Verify project listing and load logic (no Streamlit UI)."""
-import sys
 from pathlib import Path
 
-sys.path.insert(0, str(Path(__file__).parent))
-
 from src.io_utils import ProjectManager, list_projects
 from src.app_helpers import load_all_analysis_results, load_stems_from_project
 
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Check the streamed beat analysis against the in-memory one on click tracks."""
+import tempfile
+from pathlib import Path
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+from src.timing import analyze_tempo_and_beats, analyze_tempo_and_beats_stream
+
+
+def click_track(n_samples: int, sr: int, bpm: float = 117.0) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    audio = rng.standard_normal(n_samples).astype(np.float32) * 0.001
+    click = np.hanning(200).astype(np.float32)
+    for start in range(int(0.3 * sr), n_samples - len(click), int(sr * 60 / bpm)):
+        audio[start:start + len(click)] += click
+    return audio
+
+
+def main():
+    cases = [
+        (22050, 60 * 22050),
+        (44100, 60 * 44100),
+        (22050, 132708),  # last streamed block shorter than N_FFT
+        (22050, 2048),
+        (22050, 1500),    # whole file shorter than N_FFT
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "click.wav"
+        for sr, n_samples in cases:
+            sf.write(str(path), click_track(n_samples, sr), sr, subtype="FLOAT")
+            audio, _ = librosa.load(str(path), sr=None, dtype=np.float32)
+
+            full = analyze_tempo_and_beats(audio, sr)
+            streamed = analyze_tempo_and_beats_stream(str(path), block_length=64)
+
+            label = f"{n_samples} samples @ {sr} Hz"
+            assert streamed["bpm"] == full["bpm"], f"{label}: tempo differs"
+            assert np.array_equal(streamed["beat_times"], full["beat_times"]), f"{label}: beats differ"
+            assert np.allclose(streamed["beat_confidence"], full["beat_confidence"]), f"{label}: confidence differs"
+            assert streamed["duration"] == full["duration"], f"{label}: duration differs"
+            print(f"✅ {label}: {full['bpm']:.1f} BPM, {len(full['beat_times'])} beats")
+
+    print("\nStreamed and in-memory beat analysis agree.")
+
+
+if __name__ == "__main__":
+    main()